@@ -1,13 +1,18 @@
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QCheckBox,
     QGridLayout, QGroupBox, QHBoxLayout, QStackedLayout, QTableWidget, QTableWidgetItem, QPushButton, QDateEdit,
-    QSpinBox, QListWidget
+    QSpinBox, QListWidget, QListWidgetItem, QComboBox, QToolTip
 )
-from PyQt5.QtCore import Qt, QEvent, QDate
+from PyQt5.QtCore import Qt, QEvent, QDate, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QColor
 from database import Database
-from scheduler_logic import generate_schedule
+from models import DAYS, TIME_SLOTS, TimeOff
+from scenarios import Scenario, compare_scenarios
+from scheduler_logic import compile_problem, generate_schedule, who_can_work
+from datetime import datetime, timedelta
+import os
 import sys
+import time
 
 class EmployeeDialog(QDialog):
     def __init__(self, title, name="", phone="", availability=None, max_shifts=0, min_shifts=0):
@@ -139,12 +144,13 @@ class EmployeeDialog(QDialog):
 
 
 class EmployeeWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, database):
         super().__init__()
         self.setWindowTitle("Employee Scheduler")
         self.resize(800, 600)
 
-        self.database = Database()
+        # Shared with the scheduler page so its availability index sees our edits
+        self.database = database
 
         # Main layout
         self.central_widget = QWidget()
@@ -175,7 +181,7 @@ class EmployeeWindow(QMainWindow):
         """Load employees from the database into the list."""
         employees = self.database.get_all_employees()
         for employee in employees:
-            self.employee_list.addItem(employee["name"])
+            self.employee_list.addItem(employee.name)
 
     def show_new_employee_page(self):
         new_employee_dialog = EmployeeDialog("New Employee")
@@ -198,11 +204,11 @@ class EmployeeWindow(QMainWindow):
             if employee_data:
                 edit_employee_dialog = EmployeeDialog(
                     "Edit Employee",
-                    name=employee_data["name"],
-                    phone=employee_data["phone"],
-                    availability=employee_data["availability"],
-                    max_shifts=employee_data["max_shifts"],
-                    min_shifts=employee_data["min_shifts"]
+                    name=employee_data.name,
+                    phone=employee_data.phone,
+                    availability=employee_data.availability,
+                    max_shifts=employee_data.max_shifts,
+                    min_shifts=employee_data.min_shifts
                 )
                 if edit_employee_dialog.exec_():
                     updated_data = edit_employee_dialog.get_employee_data()
@@ -244,18 +250,24 @@ class SchedulerWindow(QWidget):
         self.generate_schedule_button.clicked.connect(self.generate_schedule)
         layout.addWidget(self.generate_schedule_button)
 
+        # Publishing records the week in the shift history used for fairness
+        self.current_schedule = None
+        self.publish_schedule_button = QPushButton("Publish Schedule", self)
+        self.publish_schedule_button.setEnabled(False)
+        self.publish_schedule_button.clicked.connect(self.publish_schedule)
+        layout.addWidget(self.publish_schedule_button)
+
         self.schedule_table = QTableWidget(self)
         self.schedule_table.setColumnCount(7)
         self.schedule_table.setRowCount(7)
-        self.schedule_table.setHorizontalHeaderLabels(
-            ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        )
-        time_slots = ["12am-6am", "6am-12pm", "9am-3pm", "12pm-6pm", "3pm-9pm", "6pm-12am", "9pm-3am"]
-        for row, slot in enumerate(time_slots):
+        self.schedule_table.setHorizontalHeaderLabels(DAYS)
+        for row, slot in enumerate(TIME_SLOTS):
             item = QTableWidgetItem(slot)
             self.schedule_table.setVerticalHeaderItem(row, item)
 
         self.schedule_table.cellDoubleClicked.connect(self.toggle_exclusion)
+        # Tooltips are worked out on hover, so startup doesn't load the roster
+        self.schedule_table.viewport().installEventFilter(self)
 
         self.load_empty_schedule()
         layout.addWidget(self.schedule_table)
@@ -266,6 +278,27 @@ class SchedulerWindow(QWidget):
                 item = QTableWidgetItem("")
                 self.schedule_table.setItem(row, col, item)
 
+    def eventFilter(self, watched, event):
+        if watched is self.schedule_table.viewport() and event.type() == QEvent.ToolTip:
+            index = self.schedule_table.indexAt(event.pos())
+            if index.isValid():
+                QToolTip.showText(event.globalPos(), self.cell_tooltip(index.row(), index.column()), watched)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().eventFilter(watched, event)
+
+    def cell_tooltip(self, row, col):
+        """Who is available and who prefers a cell in the selected week."""
+        day = self.schedule_table.horizontalHeaderItem(col).text()
+        slot = self.schedule_table.verticalHeaderItem(row).text()
+        shift_date = self.start_date_picker.date().toPyDate() + timedelta(days=col)
+        available, preferred = who_can_work(self.database, day, slot, shift_date)
+        return (
+            f"Available: {', '.join(sorted(available)) or 'none'}\n"
+            f"Preferred: {', '.join(sorted(preferred)) or 'none'}"
+        )
+
     def toggle_exclusion(self, row, col):
         day = self.schedule_table.horizontalHeaderItem(col).text()
         slot = self.schedule_table.verticalHeaderItem(row).text()
@@ -283,18 +316,17 @@ class SchedulerWindow(QWidget):
     def generate_schedule(self):
         start_date = self.start_date_picker.date().toString("yyyy-MM-dd")
         schedule = generate_schedule(start_date, self.database, excluded=self.excluded_slots)
+        self.current_schedule = schedule
+        self.publish_schedule_button.setEnabled(schedule.solved)
 
-        days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        time_slots = ["12am-6am", "6am-12pm", "9am-3pm", "12pm-6pm", "3pm-9pm", "6pm-12am", "9pm-3am"]
-
-        self.schedule_table.setRowCount(len(time_slots))
-        self.schedule_table.setColumnCount(len(days_of_week))
-        self.schedule_table.setHorizontalHeaderLabels(days_of_week)
-        self.schedule_table.setVerticalHeaderLabels(time_slots)
+        self.schedule_table.setRowCount(len(TIME_SLOTS))
+        self.schedule_table.setColumnCount(len(DAYS))
+        self.schedule_table.setHorizontalHeaderLabels(DAYS)
+        self.schedule_table.setVerticalHeaderLabels(TIME_SLOTS)
 
-        for row, slot in enumerate(time_slots):
-            for col, day in enumerate(days_of_week):
-                employees = schedule[day][slot]
+        for row, slot in enumerate(TIME_SLOTS):
+            for col, day in enumerate(DAYS):
+                employees = schedule.cell_text(col, row)
                 item = self.schedule_table.item(row, col)
                 if not item:
                     item = QTableWidgetItem()
@@ -303,6 +335,11 @@ class SchedulerWindow(QWidget):
                 if (day, slot) in self.excluded_slots:
                     item.setBackground(QColor("#fca5a5"))
 
+    def publish_schedule(self):
+        if self.current_schedule is not None:
+            self.database.publish_schedule(self.current_schedule)
+            self.publish_schedule_button.setEnabled(False)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -330,14 +367,28 @@ class MainWindow(QMainWindow):
         btn_timeoff.pressed.connect(self.activate_tab_3)
         button_layout.addWidget(btn_timeoff)
 
-        # Add the pages (widgets) to the stacked layout
-        self.scheduler_page = SchedulerWindow(self.database)  # Scheduler page (to be filled later)
-        self.employee_page = EmployeeWindow()  # Employee window
-        self.time_off_page = TimeOffPage(self.database)  # Time off page placeholder
-
-        self.stacklayout.addWidget(self.scheduler_page)
-        self.stacklayout.addWidget(self.employee_page)
-        self.stacklayout.addWidget(self.time_off_page)
+        btn_scenarios = QPushButton("Scenarios")
+        btn_scenarios.pressed.connect(self.activate_tab_4)
+        button_layout.addWidget(btn_scenarios)
+
+        # Pages are built the first time they are shown; until then each stack
+        # slot holds an empty container
+        self.scheduler_page = None
+        self.employee_page = None
+        self.time_off_page = None
+        self.scenario_page = None
+        self.page_factories = [
+            ("scheduler_page", lambda: SchedulerWindow(self.database)),
+            ("employee_page", lambda: EmployeeWindow(self.database)),
+            ("time_off_page", lambda: TimeOffPage(self.database)),
+            ("scenario_page", lambda: ScenarioPage(self.database, self.page(0).excluded_slots)),
+        ]
+        for _ in self.page_factories:
+            container = QWidget()
+            container_layout = QVBoxLayout(container)
+            container_layout.setContentsMargins(0, 0, 0, 0)
+            self.stacklayout.addWidget(container)
+        self.page(0)
 
         # Add the button layout and stack layout to the main layout
         pagelayout.addLayout(button_layout)
@@ -348,17 +399,35 @@ class MainWindow(QMainWindow):
         widget.setLayout(pagelayout)
         self.setCentralWidget(widget)
 
+    def page(self, index):
+        """Return the page at index, building it on first use."""
+        attribute, factory = self.page_factories[index]
+        page = getattr(self, attribute)
+        if page is None:
+            page = factory()
+            setattr(self, attribute, page)
+            self.stacklayout.widget(index).layout().addWidget(page)
+        return page
+
+    def show_page(self, index):
+        self.page(index)
+        self.stacklayout.setCurrentIndex(index)
+
     def activate_tab_1(self):
         """Switch to the scheduler page"""
-        self.stacklayout.setCurrentIndex(0)
+        self.show_page(0)
 
     def activate_tab_2(self):
         """Switch to the employee page"""
-        self.stacklayout.setCurrentIndex(1)
+        self.show_page(1)
 
     def activate_tab_3(self):
         """Switch to the time off page"""
-        self.stacklayout.setCurrentIndex(2)
+        self.show_page(2)
+
+    def activate_tab_4(self):
+        """Switch to the scenario comparison page"""
+        self.show_page(3)
 
 class TimeOffPage(QWidget):
     def __init__(self, database):
@@ -396,7 +465,7 @@ class TimeOffPage(QWidget):
         self.time_off_data = self.database.get_all_time_off_requests()
         for r in self.time_off_data:
             self.timeoff_list.addItem(
-                f"{r['employee_name']} | {r['start_date']} to {r['end_date']} | {r['reason']}"
+                f"{r.employee_name} | {r.start_date} to {r.end_date} | {r.reason}"
             )
 
     def delete_selected_request(self):
@@ -404,8 +473,8 @@ class TimeOffPage(QWidget):
         if selected_item >= 0:
             request = self.time_off_data[selected_item]
             self.database.delete_time_off_request(
-                request["employee_name"],
-                request["start_date"]
+                request.employee_name,
+                request.start_date.isoformat()
             )
             self.load_time_off_requests()
 
@@ -447,11 +516,237 @@ class TimeOffDialog(QDialog):
         }
 
 
+class ScenarioPage(QWidget):
+    def __init__(self, database, base_excluded):
+        super().__init__()
+        self.database = database
+        self.base_excluded = base_excluded  # The scheduler page's excluded cells
+        self.scenarios = []
+        self.worker = None  # ScenarioWorker for the comparison in progress
+
+        layout = QVBoxLayout(self)
+
+        self.start_date_picker = QDateEdit(self)
+        self.start_date_picker.setDate(QDate.currentDate())
+        self.start_date_picker.setCalendarPopup(True)
+        self.start_date_picker.setDisplayFormat("yyyy-MM-dd")
+        layout.addWidget(self.start_date_picker)
+
+        self.add_button = QPushButton("Add Scenario")
+        self.add_button.clicked.connect(self.show_scenario_dialog)
+        layout.addWidget(self.add_button)
+
+        self.delete_button = QPushButton("Delete Selected Scenario")
+        self.delete_button.clicked.connect(self.delete_selected_scenario)
+        layout.addWidget(self.delete_button)
+
+        self.scenario_list = QListWidget()
+        layout.addWidget(self.scenario_list)
+
+        self.compare_button = QPushButton("Compare Scenarios")
+        self.compare_button.clicked.connect(self.compare)
+        layout.addWidget(self.compare_button)
+
+        self.results_table = QTableWidget(0, 4, self)
+        self.results_table.setHorizontalHeaderLabels(
+            ["Scenario", "Score", "No Employee Cells", "Preferred Shifts"]
+        )
+        layout.addWidget(self.results_table)
+
+    def show_scenario_dialog(self):
+        names = [employee.name for employee in self.database.get_all_employees()]
+        dialog = ScenarioDialog(names, self)
+        if dialog.exec_():
+            scenario = dialog.get_scenario()
+            self.scenarios.append(scenario)
+            self.scenario_list.addItem(scenario.name)
+
+    def delete_selected_scenario(self):
+        row = self.scenario_list.currentRow()
+        if row >= 0:
+            del self.scenarios[row]
+            self.scenario_list.takeItem(row)
+
+    def compare(self):
+        start_date = self.start_date_picker.date().toString("yyyy-MM-dd")
+        # Imported here so the GUI can start without loading numpy
+        from snapshot import current_snapshot
+
+        # The database is read here, on the GUI thread; only the solving moves off it
+        problem = compile_problem(start_date, self.database)
+        snapshot = current_snapshot(self.database)
+        self.worker = ScenarioWorker(
+            problem,
+            [Scenario("Base week")] + self.scenarios,
+            excluded=self.base_excluded,
+            snapshot_path=snapshot.path if snapshot else None,
+            history=self.database.get_solve_stats(),
+        )
+        self.worker.results_ready.connect(self.show_results)
+        self.worker.failed.connect(self.show_error)
+        self.worker.finished.connect(lambda: self.compare_button.setEnabled(True))
+        self.compare_button.setEnabled(False)
+        self.results_table.setRowCount(0)
+        self.worker.start()
+
+    def show_error(self, message):
+        self.results_table.setRowCount(1)
+        self.results_table.setItem(0, 0, QTableWidgetItem(f"Comparison failed: {message}"))
+
+    def show_results(self, results):
+        # Recorded here, on the GUI thread that owns the database connection
+        for result in results:
+            if result.stats is not None:
+                self.database.record_solve(result.stats)
+
+        self.results_table.setRowCount(len(results))
+        for row, result in enumerate(results):
+            if result.solved:
+                values = [result.name, f"{result.objective:g}", str(result.unfilled), str(result.preference_hits)]
+            else:
+                values = [result.name, "No solution", "", ""]
+            for col, value in enumerate(values):
+                self.results_table.setItem(row, col, QTableWidgetItem(value))
+
+class ScenarioWorker(QThread):
+    """Runs compare_scenarios off the GUI thread so the window stays responsive."""
+    results_ready = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, problem, scenarios, **options):
+        super().__init__()
+        self.problem = problem
+        self.scenarios = scenarios
+        self.options = options
+
+    def run(self):
+        try:
+            self.results_ready.emit(compare_scenarios(self.problem, self.scenarios, **self.options))
+        except Exception as exc:
+            self.failed.emit(str(exc))
+
+class ScenarioDialog(QDialog):
+    def __init__(self, employee_names, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("New Scenario")
+
+        layout = QFormLayout(self)
+
+        self.name_input = QLineEdit()
+        layout.addRow("Scenario Name:", self.name_input)
+
+        # Cells to close on top of the base week's exclusions
+        self.excluded_list = QListWidget()
+        for day in DAYS:
+            for slot in TIME_SLOTS:
+                item = QListWidgetItem(f"{day} {slot}")
+                item.setData(Qt.UserRole, (day, slot))
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Unchecked)
+                self.excluded_list.addItem(item)
+        layout.addRow("Close Shifts:", self.excluded_list)
+
+        self.removed_list = self._employee_checklist(employee_names)
+        layout.addRow("Remove Employees:", self.removed_list)
+
+        # Hypothetical time off
+        self.time_off_list = self._employee_checklist(employee_names)
+        layout.addRow("Time Off For:", self.time_off_list)
+
+        self.time_off_start = QDateEdit()
+        self.time_off_start.setCalendarPopup(True)
+        self.time_off_start.setDate(QDate.currentDate())
+        layout.addRow("Time Off Start:", self.time_off_start)
+
+        self.time_off_end = QDateEdit()
+        self.time_off_end.setCalendarPopup(True)
+        self.time_off_end.setDate(QDate.currentDate())
+        layout.addRow("Time Off End:", self.time_off_end)
+
+        # Changed shift limits for one employee
+        self.limits_employee = QComboBox()
+        self.limits_employee.addItem("")
+        self.limits_employee.addItems(employee_names)
+        layout.addRow("Change Limits For:", self.limits_employee)
+
+        self.max_shifts_input = QSpinBox()
+        self.max_shifts_input.setRange(0, 7)
+        layout.addRow("Maximum Shifts per Week:", self.max_shifts_input)
+
+        self.min_shifts_input = QSpinBox()
+        self.min_shifts_input.setRange(0, 7)
+        layout.addRow("Minimum Shifts per Week:", self.min_shifts_input)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        layout.addWidget(button_box)
+
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+
+    def _employee_checklist(self, employee_names):
+        widget = QListWidget()
+        for name in employee_names:
+            item = QListWidgetItem(name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            widget.addItem(item)
+        return widget
+
+    @staticmethod
+    def _checked(widget, role=Qt.DisplayRole):
+        return [
+            widget.item(i).data(role)
+            for i in range(widget.count())
+            if widget.item(i).checkState() == Qt.Checked
+        ]
+
+    def get_scenario(self):
+        start = self.time_off_start.date().toPyDate()
+        end = self.time_off_end.date().toPyDate()
+        time_off = tuple(
+            TimeOff(None, name, start, end, "Scenario")
+            for name in self._checked(self.time_off_list)
+        )
+
+        limits = {}
+        if self.limits_employee.currentText():
+            limits[self.limits_employee.currentText()] = (
+                self.min_shifts_input.value(),
+                self.max_shifts_input.value(),
+            )
+
+        return Scenario(
+            name=self.name_input.text() or "Untitled",
+            excluded=tuple(self._checked(self.excluded_list, Qt.UserRole)),
+            time_off=time_off,
+            removed=frozenset(self._checked(self.removed_list)),
+            limits=limits,
+        )
+
+
+
+def report_startup_time(started):
+    """Print the time from started to the first window and optionally log it.
+
+    Set SCHEDULER_STARTUP_LOG to a file path to append one
+    "timestamp,seconds" line per launch.
+    """
+    elapsed = time.perf_counter() - started
+    print(f"Time to first window: {elapsed:.3f} s", file=sys.stderr)
+    log_path = os.environ.get("SCHEDULER_STARTUP_LOG")
+    if log_path:
+        with open(log_path, "a") as log:
+            log.write(f"{datetime.now().isoformat(timespec='seconds')},{elapsed:.3f}\n")
+
 
-def main():
+def main(started=None):
+    if started is None:
+        started = time.perf_counter()
     app = QApplication([])
     window = MainWindow()
     window.show()
+    # Fires once the event loop has processed the first show/paint events
+    QTimer.singleShot(0, lambda: report_startup_time(started))
     app.exec_()
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+
+class AvailabilityIndex:
+    """Inverted index from (day, slot) cells to the employees who can work them.
+
+    Also holds the time-off requests, with the names off on each date
+    worked out once per date and then served from a cache.
+    """
+
+    def __init__(self):
+        self._available = defaultdict(set)
+        self._preferred = defaultdict(set)
+        self._cells = defaultdict(set)
+        self._time_off = []
+        self._off_by_date = {}
+
+    def add(self, name, day, slot):
+        """Record one availability entry; a trailing ' *' marks a preferred slot."""
+        if slot.endswith(" *"):
+            slot = slot[:-2]
+            self._preferred[(day, slot)].add(name)
+        self._available[(day, slot)].add(name)
+        self._cells[name].add((day, slot))
+
+    def add_employee(self, name, availability):
+        """Index an employee's availability dict ({day: [slot, ...]})."""
+        for day, slots in availability.items():
+            for slot in slots:
+                self.add(name, day, slot)
+
+    def remove_employee(self, name):
+        """Drop every cell recorded for an employee."""
+        for cell in self._cells.pop(name, ()):
+            self._available[cell].discard(name)
+            self._preferred[cell].discard(name)
+
+    def update_employee(self, name, availability):
+        """Replace an employee's availability."""
+        self.remove_employee(name)
+        self.add_employee(name, availability)
+
+    def available(self, day, slot, exclude=()):
+        """Employees available for a cell, minus any names in exclude (e.g. time off)."""
+        names = self._available.get((day, slot), set())
+        return names - set(exclude) if exclude else set(names)
+
+    def preferred(self, day, slot, exclude=()):
+        """Employees who marked the cell as preferred, minus any names in exclude."""
+        names = self._preferred.get((day, slot), set())
+        return names - set(exclude) if exclude else set(names)
+
+    def add_time_off(self, entry):
+        """Record a TimeOff entry."""
+        self._time_off.append(entry)
+        self._off_by_date.clear()
+
+    def remove_time_off(self, name, start_date):
+        """Drop an employee's time off starting on start_date (a date)."""
+        self._time_off = [
+            entry for entry in self._time_off
+            if not (entry.employee_name == name and entry.start_date == start_date)
+        ]
+        self._off_by_date.clear()
+
+    def off_on(self, day):
+        """Names of employees with time off on a date."""
+        names = self._off_by_date.get(day)
+        if names is None:
+            names = self._off_by_date[day] = frozenset(
+                entry.employee_name for entry in self._time_off if entry.covers(day)
+            )
+        return names
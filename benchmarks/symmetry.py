@@ -0,0 +1,73 @@
+"""Compare solves with and without employee aggregation.
+
+    python -m benchmarks.symmetry --employees 120 --profiles 6
+"""
+import argparse
+import random
+import time
+from datetime import date
+from models import NUM_CELLS, TIME_SLOTS, Employee
+from scheduler_logic import Problem, employee_classes, solve
+
+
+def synthetic_problem(num_employees, num_profiles, seed=0):
+    """A roster where employees share one of num_profiles availability profiles."""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(num_profiles):
+        available = frozenset(rng.sample(range(NUM_CELLS), rng.randint(10, 25)))
+        preferred = frozenset(rng.sample(sorted(available), len(available) // 3))
+        # Keep the summed minimums within the week's cells so the roster is feasible
+        min_shifts = min(rng.randint(1, 3), NUM_CELLS // num_employees)
+        profiles.append((available, preferred, min_shifts, min_shifts + rng.randint(1, 3)))
+
+    employees = []
+    for e in range(num_employees):
+        available, preferred, min_shifts, max_shifts = profiles[e % num_profiles]
+        employees.append(
+            Employee(e, f"Employee {e}", "", max_shifts, min_shifts, available, preferred)
+        )
+    return Problem(date(2025, 1, 6), tuple(employees), ())
+
+
+def check_schedule(problem, schedule):
+    """Assert nobody works twice in a day or outside their shift limits."""
+    worked = {}
+    for cell, name in enumerate(schedule.assignments):
+        if name is not None:
+            worked.setdefault(name, []).append(cell // len(TIME_SLOTS))
+    for employee in problem.employees:
+        days = worked.get(employee.name, [])
+        assert len(days) == len(set(days)), f"{employee.name} works twice in a day"
+        assert len(days) <= employee.max_shifts, f"{employee.name} over max_shifts"
+        assert len(days) >= min(employee.min_shifts, 2), f"{employee.name} under min_shifts"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=120)
+    parser.add_argument("--profiles", type=int, default=6)
+    parser.add_argument("--time-limit", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    problem = synthetic_problem(args.employees, args.profiles, args.seed)
+    classes = employee_classes(problem.employees, {})
+
+    for aggregate in (False, True):
+        groups = len(classes) if aggregate else len(problem.employees)
+        started = time.perf_counter()
+        schedule = solve(problem, verbose=False, time_limit=args.time_limit, aggregate=aggregate)
+        elapsed = time.perf_counter() - started
+        if not schedule.solved:
+            print(f"aggregate={aggregate!s:5}  no solution within {args.time_limit} s")
+            continue
+        check_schedule(problem, schedule)
+        print(
+            f"aggregate={aggregate!s:5}  shift vars={groups * NUM_CELLS:6}  "
+            f"objective={schedule.objective}  time={elapsed:.3f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
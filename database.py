@@ -1,13 +1,36 @@
+import secrets
 import sqlite3
+from datetime import date, timedelta
+from availability_index import AvailabilityIndex
+from models import (
+    Employee, InstanceFeatures, ShiftRollup, SolveStats, TimeOff, parse_availability
+)
+
+# Bump whenever create_tables changes so existing databases get upgraded
+SCHEMA_VERSION = 5
+
+# Rolling windows, in weeks, kept in shift_rollups
+ROLLUP_WINDOWS = (4, 13)
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('employee_scheduler.db')
+    def __init__(self, path='employee_scheduler.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
         self.cursor = self.conn.cursor()
+        self._availability_index = None
+        self._index_counter = None
         self.create_tables()
 
     def create_tables(self):
-        """Create necessary tables if they don't exist."""
+        """Create necessary tables if they don't exist.
+
+        The schema version is recorded in PRAGMA user_version, so opening an
+        up-to-date database costs a single pragma read.
+        """
+        self.cursor.execute("PRAGMA user_version")
+        if self.cursor.fetchone()[0] >= SCHEMA_VERSION:
+            return
+
         self.cursor.execute("""
         CREATE TABLE IF NOT EXISTS employees (
             id INTEGER PRIMARY KEY,
@@ -34,48 +57,119 @@ class Database:
             end_date TEXT,
             reason TEXT
         )""")
-        
+
+        # Per-employee totals for each published week
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shift_history (
+            employee_name TEXT,
+            week_start TEXT,
+            shifts INTEGER,
+            preferred INTEGER,
+            unwanted INTEGER,
+            PRIMARY KEY (employee_name, week_start)
+        )""")
+
+        # shift_history summed over the last window_weeks weeks up to as_of,
+        # kept up to date by publish_schedule
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shift_rollups (
+            employee_name TEXT,
+            window_weeks INTEGER,
+            shifts INTEGER,
+            preferred INTEGER,
+            unwanted INTEGER,
+            weeks INTEGER,
+            as_of TEXT,
+            PRIMARY KEY (employee_name, window_weeks)
+        )""")
+
+        # One row per solve, used to pick time limits for later solves
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS solve_stats (
+            id INTEGER PRIMARY KEY,
+            employees INTEGER,
+            active_cells INTEGER,
+            excluded_cells INTEGER,
+            time_off_density REAL,
+            time_limit REAL,
+            num_workers INTEGER,
+            status TEXT,
+            wall_time REAL,
+            time_to_first REAL,
+            time_to_optimal REAL
+        )""")
+
+        # change_counter goes up with every roster or time-off write, so cached
+        # copies of that data (see snapshot.py) can tell when they are stale.
+        # database_id is random per database, so a recreated or restored file
+        # whose counter happens to match is not mistaken for the old one
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )""")
+        self.cursor.execute("""
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('change_counter', 0)""")
+        self.cursor.execute("""
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', ?)""", (secrets.randbits(63),))
+
+        self.cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         self.conn.commit()
 
     def add_employee(self, name, phone, availability, max_shifts, min_shifts):
         """Add a new employee with availability."""
+        try:
+            self.cursor.execute("""
+            INSERT INTO employees (name, phone, max_shifts, min_shifts)
+            VALUES (?, ?, ?, ?)""", (name, phone, max_shifts, min_shifts))
+            employee_id = self.cursor.lastrowid
+
+            for day, time_slots in availability.items():
+                for slot in time_slots:
+                    self.cursor.execute("""
+                    INSERT INTO availability (employee_id, day, time_slot)
+                    VALUES (?, ?, ?)""", (employee_id, day, slot))
+
+            self._bump_change_counter()
+            self.conn.commit()
+        except Exception:
+            # Don't leave a half-added employee for the next commit to pick up
+            self.conn.rollback()
+            raise
+
+        if self._index_follows_write():
+            self._availability_index.add_employee(name, availability)
+
+    def _bump_change_counter(self):
         self.cursor.execute("""
-        INSERT INTO employees (name, phone, max_shifts, min_shifts)
-        VALUES (?, ?, ?, ?)""", (name, phone, max_shifts, min_shifts))
-        employee_id = self.cursor.lastrowid
+        UPDATE meta SET value = value + 1 WHERE key = 'change_counter'""")
 
-        for day, time_slots in availability.items():
-            for slot in time_slots:
-                self.cursor.execute("""
-                INSERT INTO availability (employee_id, day, time_slot)
-                VALUES (?, ?, ?)""", (employee_id, day, slot))
-        
-        self.conn.commit()
+    def change_counter(self):
+        """Return the number of roster and time-off writes made to this database."""
+        self.cursor.execute("""
+        SELECT value FROM meta WHERE key = 'change_counter'""")
+        return self.cursor.fetchone()[0]
+
+    def database_id(self):
+        """Return the random id this database was given when it was created."""
+        self.cursor.execute("""
+        SELECT value FROM meta WHERE key = 'database_id'""")
+        return self.cursor.fetchone()[0]
 
     def get_all_employees(self):
         """Retrieve all employees with their availability."""
+        self.cursor.execute("""
+        SELECT employee_id, day, time_slot FROM availability""")
+        availability = {}
+        for employee_id, day, slot in self.cursor.fetchall():
+            availability.setdefault(employee_id, {}).setdefault(day, []).append(slot)
+
         self.cursor.execute("""
         SELECT id, name, phone, max_shifts, min_shifts FROM employees""")
-        employees = []
-        
-        for row in self.cursor.fetchall():
-            employee_id, name, phone, max_shifts, min_shifts = row
-            self.cursor.execute("""
-            SELECT day, time_slot FROM availability WHERE employee_id = ?""", (employee_id,))
-            availability = {}
-            for day, slot in self.cursor.fetchall():
-                if day not in availability:
-                    availability[day] = []
-                availability[day].append(slot)
-            employees.append({
-                "name": name,
-                "phone": phone,
-                "max_shifts": max_shifts,
-                "min_shifts": min_shifts,
-                "availability": availability
-            })
-        
-        return employees
+        return [
+            self._make_employee(row, availability.get(row[0], {}))
+            for row in self.cursor.fetchall()
+        ]
 
     def get_employee_by_name(self, name):
         """Retrieve an employee's details by name."""
@@ -83,44 +177,48 @@ class Database:
         SELECT id, name, phone, max_shifts, min_shifts FROM employees WHERE name = ?""", (name,))
         employee = self.cursor.fetchone()
         if employee:
-            employee_id, name, phone, max_shifts, min_shifts = employee
             self.cursor.execute("""
-            SELECT day, time_slot FROM availability WHERE employee_id = ?""", (employee_id,))
+            SELECT day, time_slot FROM availability WHERE employee_id = ?""", (employee[0],))
             availability = {}
             for day, slot in self.cursor.fetchall():
-                if day not in availability:
-                    availability[day] = []
-                availability[day].append(slot)
-            return {
-                "name": name,
-                "phone": phone,
-                "max_shifts": max_shifts,
-                "min_shifts": min_shifts,
-                "availability": availability
-            }
+                availability.setdefault(day, []).append(slot)
+            return self._make_employee(employee, availability)
         return None
 
+    @staticmethod
+    def _make_employee(row, availability):
+        employee_id, name, phone, max_shifts, min_shifts = row
+        available, preferred = parse_availability(availability)
+        return Employee(employee_id, name, phone, max_shifts, min_shifts, available, preferred)
+
     def update_employee(self, name, phone, availability, max_shifts, min_shifts):
         """Update an existing employee's details."""
-        self.cursor.execute("""
-        UPDATE employees SET name = ?, phone = ?, max_shifts = ?, min_shifts = ?
-        WHERE name = ?""", (name, phone, max_shifts, min_shifts, name))
-        
-        self.cursor.execute("""
-        DELETE FROM availability WHERE employee_id IN (SELECT id FROM employees WHERE name = ?)""", (name,))
-        self.conn.commit()
+        try:
+            self.cursor.execute("""
+            UPDATE employees SET name = ?, phone = ?, max_shifts = ?, min_shifts = ?
+            WHERE name = ?""", (name, phone, max_shifts, min_shifts, name))
 
-        self.cursor.execute("""
-        SELECT id FROM employees WHERE name = ?""", (name,))
-        employee_id = self.cursor.fetchone()[0]
+            self.cursor.execute("""
+            DELETE FROM availability WHERE employee_id IN (SELECT id FROM employees WHERE name = ?)""", (name,))
 
-        for day, time_slots in availability.items():
-            for slot in time_slots:
-                self.cursor.execute("""
-                INSERT INTO availability (employee_id, day, time_slot)
-                VALUES (?, ?, ?)""", (employee_id, day, slot))
+            self.cursor.execute("""
+            SELECT id FROM employees WHERE name = ?""", (name,))
+            employee_id = self.cursor.fetchone()[0]
 
-        self.conn.commit()
+            for day, time_slots in availability.items():
+                for slot in time_slots:
+                    self.cursor.execute("""
+                    INSERT INTO availability (employee_id, day, time_slot)
+                    VALUES (?, ?, ?)""", (employee_id, day, slot))
+
+            self._bump_change_counter()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        if self._index_follows_write():
+            self._availability_index.update_employee(name, availability)
 
     def delete_employee(self, name):
         """Delete an employee by name."""
@@ -128,32 +226,216 @@ class Database:
         DELETE FROM availability WHERE employee_id IN (SELECT id FROM employees WHERE name = ?)""", (name,))
         self.cursor.execute("""
         DELETE FROM employees WHERE name = ?""", (name,))
+        self._bump_change_counter()
         self.conn.commit()
 
+        if self._index_follows_write():
+            self._availability_index.remove_employee(name)
+
+    def availability_index(self):
+        """Return the (day, slot) -> employees index with time off.
+
+        The index is built on first use and rebuilt whenever change_counter
+        shows a write this connection did not make, e.g. from the service.
+        """
+        counter = self.change_counter()
+        if self._availability_index is None or self._index_counter != counter:
+            index = AvailabilityIndex()
+            self.cursor.execute("""
+            SELECT e.name, a.day, a.time_slot FROM availability a
+            JOIN employees e ON e.id = a.employee_id""")
+            for name, day, slot in self.cursor.fetchall():
+                index.add(name, day, slot)
+            for entry in self.get_all_time_off_requests():
+                index.add_time_off(entry)
+            self._availability_index = index
+            self._index_counter = counter
+        return self._availability_index
+
+    def _index_follows_write(self):
+        """Return True if the index can be patched for the write just committed.
+
+        That holds when the index was current right before it; otherwise it
+        is left to be rebuilt on next use.
+        """
+        if self._availability_index is None:
+            return False
+        counter = self.change_counter()
+        if self._index_counter != counter - 1:
+            return False
+        self._index_counter = counter
+        return True
+
     def add_time_off_request(self, employee_name, start_date, end_date, reason):
         """Add a new time-off request to the database."""
         self.cursor.execute("""
         INSERT INTO time_off_requests (employee_name, start_date, end_date, reason)
         VALUES (?, ?, ?, ?)""", (employee_name, start_date, end_date, reason))
+        request_id = self.cursor.lastrowid
+        self._bump_change_counter()
         self.conn.commit()
 
+        if self._index_follows_write():
+            self._availability_index.add_time_off(TimeOff(
+                request_id,
+                employee_name,
+                date.fromisoformat(start_date),
+                date.fromisoformat(end_date),
+                reason,
+            ))
+
     def get_all_time_off_requests(self):
         """Retrieve all time-off requests from the database."""
         self.cursor.execute("""
-        SELECT employee_name, start_date, end_date, reason FROM time_off_requests""")
-        requests = []
-        for row in self.cursor.fetchall():
-            employee_name, start_date, end_date, reason = row
-            requests.append({
-                "employee_name": employee_name,
-                "start_date": start_date,
-                "end_date": end_date,
-                "reason": reason
-            })
-        return requests
+        SELECT id, employee_name, start_date, end_date, reason FROM time_off_requests""")
+        return [
+            TimeOff(
+                request_id,
+                employee_name,
+                date.fromisoformat(start_date),
+                date.fromisoformat(end_date),
+                reason,
+            )
+            for request_id, employee_name, start_date, end_date, reason in self.cursor.fetchall()
+        ]
     
     def delete_time_off_request(self, employee_name, start_date):
         """Delete a time-off request by employee name and start date."""
         self.cursor.execute("""
         DELETE FROM time_off_requests WHERE employee_name = ? AND start_date = ?""", (employee_name, start_date))
-        self.conn.commit()
\ No newline at end of file
+        self._bump_change_counter()
+        self.conn.commit()
+
+        if self._index_follows_write():
+            self._availability_index.remove_time_off(employee_name, date.fromisoformat(start_date))
+
+    def publish_schedule(self, schedule):
+        """Record a solved Schedule in shift_history and update the rollups.
+
+        Publishing a week again replaces its earlier totals. Rollups are
+        adjusted by the change rather than recomputed, except when the
+        window jumps past everything it held.
+        """
+        if not schedule.solved:
+            return
+
+        week = schedule.start_date.isoformat()
+        employees = {employee.name: employee for employee in self.get_all_employees()}
+        # Everyone on the roster gets a row, so weeks without shifts count too
+        counts = {name: [0, 0, 0] for name in employees}
+        for cell, name in enumerate(schedule.assignments):
+            if name is None or cell in schedule.excluded:
+                continue
+            row = counts.setdefault(name, [0, 0, 0])
+            row[0] += 1
+            employee = employees.get(name)
+            if employee is not None:
+                row[1] += cell in employee.preferred
+                row[2] += cell not in employee.available
+
+        self.cursor.execute("""
+        SELECT employee_name, shifts, preferred, unwanted FROM shift_history
+        WHERE week_start = ?""", (week,))
+        previous = {name: totals for name, *totals in self.cursor.fetchall()}
+
+        self.cursor.execute("""
+        DELETE FROM shift_history WHERE week_start = ?""", (week,))
+        self.cursor.executemany("""
+        INSERT INTO shift_history (employee_name, week_start, shifts, preferred, unwanted)
+        VALUES (?, ?, ?, ?, ?)""", [(name, week, *totals) for name, totals in counts.items()])
+
+        for window in ROLLUP_WINDOWS:
+            self._update_rollup(window, schedule.start_date, counts, previous)
+
+        self.conn.commit()
+
+    def _update_rollup(self, window, week_start, counts, previous):
+        self.cursor.execute("""
+        SELECT MAX(as_of) FROM shift_rollups WHERE window_weeks = ?""", (window,))
+        as_of = self.cursor.fetchone()[0]
+        as_of = date.fromisoformat(as_of) if as_of else None
+        span = timedelta(weeks=window)
+
+        if as_of is None or week_start - as_of >= span:
+            # Nothing from the old window survives; rebuild it from history
+            self._rebuild_rollup(window, week_start)
+            return
+
+        if week_start > as_of:
+            # Slide the window: drop the weeks that fall out of it, add this one
+            self.cursor.execute("""
+            SELECT employee_name, SUM(shifts), SUM(preferred), SUM(unwanted), COUNT(*)
+            FROM shift_history WHERE week_start > ? AND week_start <= ?
+            GROUP BY employee_name""", ((as_of - span).isoformat(), (week_start - span).isoformat()))
+            deltas = {name: [-v for v in totals] for name, *totals in self.cursor.fetchall()}
+            for name, totals in counts.items():
+                delta = deltas.setdefault(name, [0, 0, 0, 0])
+                for i, value in enumerate(totals):
+                    delta[i] += value
+                delta[3] += 1
+            as_of = week_start
+        elif week_start > as_of - span:
+            # Republished or back-filled week inside the window
+            deltas = {}
+            for name, totals in counts.items():
+                old = previous.get(name)
+                deltas[name] = [value - (old[i] if old else 0) for i, value in enumerate(totals)]
+                deltas[name].append(0 if old else 1)
+            for name, old in previous.items():
+                if name not in counts:
+                    deltas[name] = [-value for value in old] + [-1]
+        else:
+            return
+
+        self.cursor.executemany("""
+        INSERT INTO shift_rollups (employee_name, window_weeks, shifts, preferred, unwanted, weeks, as_of)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (employee_name, window_weeks) DO UPDATE SET
+            shifts = shifts + excluded.shifts,
+            preferred = preferred + excluded.preferred,
+            unwanted = unwanted + excluded.unwanted,
+            weeks = weeks + excluded.weeks""",
+            [(name, window, *delta, as_of.isoformat()) for name, delta in deltas.items()])
+        self.cursor.execute("""
+        UPDATE shift_rollups SET as_of = ? WHERE window_weeks = ?""", (as_of.isoformat(), window))
+
+    def _rebuild_rollup(self, window, as_of):
+        self.cursor.execute("""
+        DELETE FROM shift_rollups WHERE window_weeks = ?""", (window,))
+        self.cursor.execute("""
+        INSERT INTO shift_rollups (employee_name, window_weeks, shifts, preferred, unwanted, weeks, as_of)
+        SELECT employee_name, ?, SUM(shifts), SUM(preferred), SUM(unwanted), COUNT(*), ?
+        FROM shift_history WHERE week_start > ? AND week_start <= ?
+        GROUP BY employee_name""",
+            (window, as_of.isoformat(), (as_of - timedelta(weeks=window)).isoformat(), as_of.isoformat()))
+
+    def get_shift_rollups(self, window):
+        """Return {employee_name: ShiftRollup} for a rolling window in ROLLUP_WINDOWS."""
+        self.cursor.execute("""
+        SELECT employee_name, shifts, preferred, unwanted, weeks FROM shift_rollups
+        WHERE window_weeks = ? AND weeks > 0""", (window,))
+        return {name: ShiftRollup(*totals) for name, *totals in self.cursor.fetchall()}
+
+    def record_solve(self, stats):
+        """Store the SolveStats of a finished solve."""
+        features = stats.features
+        self.cursor.execute("""
+        INSERT INTO solve_stats (employees, active_cells, excluded_cells, time_off_density,
+            time_limit, num_workers, status, wall_time, time_to_first, time_to_optimal)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
+            features.employees, features.active_cells, features.excluded_cells,
+            features.time_off_density, stats.time_limit, stats.num_workers, stats.status,
+            stats.wall_time, stats.time_to_first, stats.time_to_optimal,
+        ))
+        self.conn.commit()
+
+    def get_solve_stats(self, limit=500):
+        """Return the most recent SolveStats, newest first."""
+        self.cursor.execute("""
+        SELECT employees, active_cells, excluded_cells, time_off_density, time_limit,
+            num_workers, status, wall_time, time_to_first, time_to_optimal
+        FROM solve_stats ORDER BY id DESC LIMIT ?""", (limit,))
+        return [
+            SolveStats(InstanceFeatures(*row[:4]), *row[4:])
+            for row in self.cursor.fetchall()
+        ]
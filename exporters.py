@@ -0,0 +1,270 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from datetime import date, datetime, timedelta, timezone
+from database import Database
+from models import DAYS, TIME_SLOTS, EXCLUDED, NO_EMPLOYEE, UNSOLVED
+from scheduler_logic import FAIRNESS_WINDOW, excluded_cells, instance_features, solve, week_problem
+from snapshot import current_snapshot, load_roster
+from solve_budget import suggest_budget
+
+CSV_FIELDS = ["date", "day", "slot", "employee", "status"]
+
+# Most .ics feeds kept open at once by write_ics; well under the usual file limits
+MAX_OPEN_FEEDS = 64
+
+
+# -------------------- Solving --------------------
+
+# Set once per worker process; each task then only carries its week and time off
+_roster = ()
+_excluded = frozenset()
+_solver_workers = 0
+
+
+def _init_worker(roster, excluded, solver_workers):
+    global _roster, _excluded, _solver_workers
+    _roster = load_roster(roster)
+    _excluded = excluded
+    _solver_workers = solver_workers
+
+
+def _solve_week(problem, time_limit):
+    return solve(
+        replace(problem, employees=_roster),
+        _excluded,
+        verbose=False,
+        num_workers=_solver_workers,
+        time_limit=time_limit,
+    )
+
+
+def iter_schedules(database, start_date, end_date, excluded=None, max_workers=None, time_limit=None):
+    """Yield a Schedule for each week starting at start_date up to end_date.
+
+    Weeks are solved in a process pool with a bounded number in flight, so
+    memory stays flat however long the range is. Schedules come out in
+    date order. Every week is weighted with the same shift-history rollup
+    as compile_problem. Without a time_limit each week gets one learned
+    from past solves, and every solve is recorded.
+    """
+    snapshot = current_snapshot(database)
+    if snapshot is not None:
+        employees, time_off_requests = snapshot.employees(), snapshot.time_off()
+        # Workers map the snapshot file themselves instead of unpickling the roster
+        roster = snapshot.path
+    else:
+        employees = tuple(database.get_all_employees())
+        time_off_requests = database.get_all_time_off_requests()
+        roster = employees
+    excluded_set = excluded_cells(excluded)
+    history = database.get_solve_stats()
+    # The same shift-history weighting generate_schedule and the service use
+    rollups = database.get_shift_rollups(FAIRNESS_WINDOW)
+
+    cpus = os.cpu_count() or 1
+    max_workers = max_workers or cpus
+    solver_workers = max(1, cpus // max_workers)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(roster, excluded_set, solver_workers),
+    ) as pool:
+        pending = deque()
+        week_start = start_date
+        while week_start <= end_date or pending:
+            while week_start <= end_date and len(pending) < 2 * max_workers:
+                problem = week_problem(week_start, employees, time_off_requests, rollups)
+                week_limit = time_limit or suggest_budget(
+                    history, instance_features(problem, excluded_set), cpus=solver_workers
+                )[0]
+                # The roster is already in every worker, so only send the week's time off
+                pending.append(pool.submit(_solve_week, replace(problem, employees=()), week_limit))
+                week_start += timedelta(days=len(DAYS))
+            schedule = pending.popleft().result()
+            database.record_solve(schedule.stats)
+            yield schedule
+
+
+def iter_shifts(schedule):
+    """Yield one (date, day, slot, employee, status) row per cell of a Schedule."""
+    for d, day in enumerate(DAYS):
+        shift_date = schedule.start_date + timedelta(days=d)
+        for s, slot in enumerate(TIME_SLOTS):
+            text = schedule.cell_text(d, s)
+            if text in (EXCLUDED, NO_EMPLOYEE, UNSOLVED):
+                yield shift_date, day, slot, "", text
+            else:
+                yield shift_date, day, slot, text, "assigned"
+
+
+# -------------------- Writers --------------------
+
+def write_csv(schedules, fp):
+    """Write one CSV row per cell; returns the number of rows written."""
+    writer = csv.writer(fp)
+    writer.writerow(CSV_FIELDS)
+    rows = 0
+    for schedule in schedules:
+        for shift_date, day, slot, employee, status in iter_shifts(schedule):
+            writer.writerow([shift_date.isoformat(), day, slot, employee, status])
+            rows += 1
+    return rows
+
+
+def write_jsonl(schedules, fp):
+    """Write one JSON object per cell; returns the number of lines written."""
+    rows = 0
+    for schedule in schedules:
+        for row in iter_shifts(schedule):
+            record = dict(zip(CSV_FIELDS, row))
+            record["date"] = record["date"].isoformat()
+            fp.write(json.dumps(record) + "\n")
+            rows += 1
+    return rows
+
+
+def slot_times(shift_date, slot):
+    """Return (start, end) datetimes for a slot like "9pm-3am" on shift_date."""
+    start_text, end_text = slot.split("-")
+    start = datetime.combine(shift_date, datetime.strptime(start_text, "%I%p").time())
+    end = datetime.combine(shift_date, datetime.strptime(end_text, "%I%p").time())
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _ics_escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _feed_filename(employee, taken):
+    """Return a file name for employee's feed not in taken (compared case-insensitively).
+
+    Names that sanitize alike, such as "A B" and "A_B", or differ only in
+    case, get a numbered suffix rather than overwriting each other.
+    """
+    base = re.sub(r"[^\w.-]+", "_", employee)
+    filename, n = f"{base}.ics", 1
+    while filename.casefold() in taken:
+        n += 1
+        filename = f"{base}-{n}.ics"
+    taken.add(filename.casefold())
+    return filename
+
+
+def _uid_token(employee):
+    """A stable token unique to an employee name, for event UIDs."""
+    return hashlib.sha1(employee.encode()).hexdigest()[:16]
+
+
+def write_ics(schedules, directory, calendar_name="Work Schedule", max_open=MAX_OPEN_FEEDS):
+    """Write one <employee>.ics feed per employee into directory.
+
+    Schedules stream through, so only the current week is held in memory.
+    At most max_open feeds are open at a time; the least recently used one
+    is closed and reopened for appending when it is needed again. Returns
+    the number of events written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    paths = {}  # employee -> feed path, for every feed started
+    taken = set()  # file names in use, casefolded
+    feeds = OrderedDict()  # employee -> open file, least recently used first
+    events = 0
+
+    def feed(employee):
+        fp = feeds.get(employee)
+        if fp is not None:
+            feeds.move_to_end(employee)
+            return fp
+        if len(feeds) >= max_open:
+            feeds.popitem(last=False)[1].close()
+        path = paths.get(employee)
+        if path is not None:
+            fp = feeds[employee] = open(path, "a", newline="\r\n")
+            return fp
+        path = paths[employee] = os.path.join(directory, _feed_filename(employee, taken))
+        fp = feeds[employee] = open(path, "w", newline="\r\n")
+        fp.write(
+            "BEGIN:VCALENDAR\n"
+            "VERSION:2.0\n"
+            "PRODID:-//Employee Scheduler//EN\n"
+            f"X-WR-CALNAME:{_ics_escape(f'{calendar_name} - {employee}')}\n"
+        )
+        return fp
+
+    try:
+        for schedule in schedules:
+            for shift_date, day, slot, employee, status in iter_shifts(schedule):
+                if status != "assigned":
+                    continue
+                start, end = slot_times(shift_date, slot)
+                feed(employee).write(
+                    "BEGIN:VEVENT\n"
+                    f"UID:{shift_date.isoformat()}-{slot}-{_uid_token(employee)}@scheduler\n"
+                    f"DTSTAMP:{stamp}\n"
+                    f"DTSTART:{start:%Y%m%dT%H%M%S}\n"
+                    f"DTEND:{end:%Y%m%dT%H%M%S}\n"
+                    f"SUMMARY:{_ics_escape(f'Shift {slot}')}\n"
+                    "END:VEVENT\n"
+                )
+                events += 1
+    finally:
+        for fp in feeds.values():
+            fp.close()
+        feeds.clear()
+        # Close every calendar, one handle at a time
+        for path in paths.values():
+            with open(path, "a", newline="\r\n") as fp:
+                fp.write("END:VCALENDAR\n")
+    return events
+
+
+# -------------------- Command Line --------------------
+
+def export_store(db_path, out_dir, fmt, start_date, end_date, max_workers=None, time_limit=None):
+    """Export one store's schedules; returns the number of rows or events written."""
+    store = os.path.splitext(os.path.basename(db_path))[0]
+    database = Database(db_path)
+    schedules = iter_schedules(
+        database, start_date, end_date, max_workers=max_workers, time_limit=time_limit
+    )
+    if fmt == "ics":
+        return write_ics(schedules, os.path.join(out_dir, store))
+    path = os.path.join(out_dir, f"{store}.{fmt}")
+    with open(path, "w", newline="") as fp:
+        return write_csv(schedules, fp) if fmt == "csv" else write_jsonl(schedules, fp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export generated schedules without the GUI.")
+    parser.add_argument("--db", action="append", required=True,
+                        help="store database; repeat for several stores")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="first week start (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last week start (default: same as --start)")
+    parser.add_argument("--format", choices=["csv", "jsonl", "ics"], default="csv")
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--workers", type=int, help="solver processes per store")
+    parser.add_argument("--time-limit", type=float, help="seconds per week (default: learned from past solves)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    for db_path in args.db:
+        written = export_store(
+            db_path, args.out, args.format, args.start, args.end or args.start,
+            max_workers=args.workers, time_limit=args.time_limit,
+        )
+        print(f"{db_path}: {written} {'events' if args.format == 'ics' else 'rows'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
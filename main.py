@@ -1,4 +1,9 @@
+import time
+
+# Taken before the GUI imports so the startup report covers them
+started = time.perf_counter()
+
 from app import main
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(started)
\ No newline at end of file
@@ -1,10 +1,131 @@
+from dataclasses import dataclass
+from datetime import date
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+TIME_SLOTS = ("12am-6am", "6am-12pm", "9am-3pm", "12pm-6pm", "3pm-9pm", "6pm-12am", "9pm-3am")
+
+# Interned integer ids; a (day, slot) cell is stored as day_id * len(TIME_SLOTS) + slot_id
+DAY_IDS = {day: d for d, day in enumerate(DAYS)}
+SLOT_IDS = {slot: s for s, slot in enumerate(TIME_SLOTS)}
+NUM_CELLS = len(DAYS) * len(TIME_SLOTS)
+
+NO_EMPLOYEE = "No Employee"
+EXCLUDED = "Excluded"
+UNSOLVED = "No Employees"
+
+
+def cell_id(d, s):
+    return d * len(TIME_SLOTS) + s
+
+
+def cell_of(day, slot):
+    """Return the cell id for day/slot names, or None if either is unknown."""
+    d = DAY_IDS.get(day)
+    s = SLOT_IDS.get(slot)
+    if d is None or s is None:
+        return None
+    return cell_id(d, s)
+
+
+def parse_availability(availability):
+    """Convert {day: ["slot", "slot *"]} into (available, preferred) cell frozensets."""
+    available = set()
+    preferred = set()
+    for day, slots in availability.items():
+        for slot in slots:
+            is_preferred = slot.endswith(" *")
+            cell = cell_of(day, slot[:-2] if is_preferred else slot)
+            if cell is None:
+                continue
+            available.add(cell)
+            if is_preferred:
+                preferred.add(cell)
+    return frozenset(available), frozenset(preferred)
+
+
+@dataclass(frozen=True, slots=True)
 class Employee:
-    def __init__(self, id, name):
-        self.id = id
-        self.name = name
-
-class Availability:
-    def __init__(self, employee, day, shift):
-        self.employee = employee
-        self.day = day
-        self.shift = shift
\ No newline at end of file
+    id: int
+    name: str
+    phone: str
+    max_shifts: int
+    min_shifts: int
+    available: frozenset  # cell ids, preferred ones included
+    preferred: frozenset  # cell ids
+
+    @property
+    def availability(self):
+        """The {day: ["slot", "slot *"]} form used by the editor dialog."""
+        result = {day: [] for day in DAYS}
+        for cell in sorted(self.available):
+            d, s = divmod(cell, len(TIME_SLOTS))
+            slot = TIME_SLOTS[s]
+            result[DAYS[d]].append(f"{slot} *" if cell in self.preferred else slot)
+        return result
+
+
+@dataclass(frozen=True, slots=True)
+class TimeOff:
+    id: int
+    employee_name: str
+    start_date: date
+    end_date: date
+    reason: str
+
+    def covers(self, day):
+        return self.start_date <= day <= self.end_date
+
+
+@dataclass(frozen=True, slots=True)
+class ShiftRollup:
+    """An employee's totals over the published weeks in a rolling window."""
+    shifts: int
+    preferred: int  # shifts worked in a preferred slot
+    unwanted: int  # shifts worked outside their availability
+    weeks: int  # published weeks in the window
+
+
+@dataclass(frozen=True, slots=True)
+class InstanceFeatures:
+    """Size measures of one solve, used to predict how long the next will take."""
+    employees: int
+    active_cells: int
+    excluded_cells: int
+    time_off_density: float  # share of (employee, day) pairs with time off
+
+
+@dataclass(frozen=True, slots=True)
+class SolveStats:
+    features: InstanceFeatures
+    time_limit: float  # None when unbounded
+    num_workers: int  # 0 when left to the solver
+    status: str
+    wall_time: float
+    time_to_first: float  # None when no solution was found
+    time_to_optimal: float  # None when optimality was not proven
+
+
+@dataclass(slots=True)
+class Schedule:
+    start_date: date
+    # One entry per cell id: the assigned employee's name, or None if unfilled
+    assignments: list
+    excluded: frozenset
+    solved: bool = True
+    objective: float = None
+    stats: SolveStats = None
+
+    def cell_text(self, d, s):
+        cell = cell_id(d, s)
+        if cell in self.excluded:
+            return EXCLUDED
+        if not self.solved:
+            return UNSOLVED
+        return self.assignments[cell] or NO_EMPLOYEE
+
+    def as_table(self):
+        """Return {day: {slot: text}} for display."""
+        return {
+            day: {slot: self.cell_text(d, s) for s, slot in enumerate(TIME_SLOTS)}
+            for d, day in enumerate(DAYS)
+        }
@@ -0,0 +1,130 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from models import NUM_CELLS, SolveStats
+from scheduler_logic import excluded_cells, instance_features, solve
+from solve_budget import suggest_budget
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """A variation on the base week to evaluate."""
+    name: str
+    excluded: tuple = ()  # extra (day, slot) pairs to close
+    time_off: tuple = ()  # hypothetical TimeOff entries
+    removed: frozenset = frozenset()  # employee names to leave out
+    limits: dict = field(default_factory=dict)  # name -> (min_shifts, max_shifts)
+
+    def apply(self, problem):
+        """Return a copy of problem with this scenario's changes applied."""
+        employees = []
+        for employee in problem.employees:
+            if employee.name in self.removed:
+                continue
+            if employee.name in self.limits:
+                min_shifts, max_shifts = self.limits[employee.name]
+                employee = replace(employee, min_shifts=min_shifts, max_shifts=max_shifts)
+            employees.append(employee)
+        return replace(
+            problem,
+            employees=tuple(employees),
+            time_off=problem.time_off + tuple(self.time_off),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ScenarioResult:
+    name: str
+    solved: bool
+    objective: float
+    unfilled: int
+    preference_hits: int
+    stats: SolveStats = None  # for Database.record_solve
+
+
+def summarize(name, problem, schedule):
+    """Score a solved Schedule against the Problem it came from."""
+    if not schedule.solved:
+        return ScenarioResult(name, False, None, None, None, schedule.stats)
+
+    preferred = {employee.name: employee.preferred for employee in problem.employees}
+    unfilled = 0
+    preference_hits = 0
+    for cell in range(NUM_CELLS):
+        if cell in schedule.excluded:
+            continue
+        name_assigned = schedule.assignments[cell]
+        if name_assigned is None:
+            unfilled += 1
+        elif cell in preferred[name_assigned]:
+            preference_hits += 1
+    return ScenarioResult(name, True, schedule.objective, unfilled, preference_hits, schedule.stats)
+
+
+# Set once per worker process so scenarios share one copy of the base problem
+_base_problem = None
+_base_excluded = frozenset()
+_solver_workers = 0
+_time_limit = None
+
+
+def _init_worker(problem, roster, excluded, solver_workers, time_limit):
+    # Imported here so the GUI can start without loading numpy
+    from snapshot import load_roster
+
+    global _base_problem, _base_excluded, _solver_workers, _time_limit
+    _base_problem = replace(problem, employees=load_roster(roster))
+    _base_excluded = excluded
+    _solver_workers = solver_workers
+    _time_limit = time_limit
+
+
+def _evaluate(scenario):
+    problem = scenario.apply(_base_problem)
+    schedule = solve(
+        problem,
+        _base_excluded | excluded_cells(scenario.excluded),
+        verbose=False,
+        num_workers=_solver_workers,
+        time_limit=_time_limit,
+    )
+    return summarize(scenario.name, problem, schedule)
+
+
+def compare_scenarios(problem, scenarios, excluded=None, max_workers=None, snapshot_path=None,
+                      time_limit=None, history=()):
+    """Solve each scenario against a compiled base Problem in a process pool.
+
+    excluded holds the base week's closed (day, slot) pairs. When
+    snapshot_path names a current snapshot of the problem's roster, workers
+    map it rather than receiving the roster pickled. Every scenario gets
+    time_limit seconds, or without one the limit suggest_budget picks for
+    the base week from history (past SolveStats). Results come back in the
+    same order as scenarios.
+    """
+    scenarios = list(scenarios)
+    if not scenarios:
+        return []
+
+    cpus = os.cpu_count() or 1
+    max_workers = min(max_workers or cpus, len(scenarios))
+    # Split the CPUs between processes rather than letting every solver use all of them
+    solver_workers = max(1, cpus // max_workers)
+    excluded_set = excluded_cells(excluded)
+    if not time_limit:
+        time_limit = suggest_budget(
+            history, instance_features(problem, excluded_set), cpus=solver_workers
+        )[0]
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(
+            replace(problem, employees=()),
+            snapshot_path or problem.employees,
+            excluded_set,
+            solver_workers,
+            time_limit,
+        ),
+    ) as pool:
+        return list(pool.map(_evaluate, scenarios))
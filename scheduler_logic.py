@@ -1,168 +1,338 @@
-from ortools.sat.python import cp_model
-from datetime import datetime, timedelta
-from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from solve_budget import suggest_budget
+from models import (
+    DAYS, TIME_SLOTS, NUM_CELLS, InstanceFeatures, Schedule, SolveStats, cell_id, cell_of
+)
+
+
+def names_on_time_off(time_off_requests, date):
+    """Return the names of employees with a time-off request covering date."""
+    return {entry.employee_name for entry in time_off_requests if entry.covers(date)}
+
+
+def who_can_work(database, day, slot, date=None):
+    """Return (available, preferred) name sets for a cell.
+
+    When date is given, employees with time off on that date are left out.
+    """
+    index = database.availability_index()
+    off = index.off_on(date) if date else ()
+    return index.available(day, slot, exclude=off), index.preferred(day, slot, exclude=off)
+
+
+# Rolling window, in weeks, of published history used to weight the objective
+FAIRNESS_WINDOW = 13
+
+
+@dataclass(frozen=True, slots=True)
+class Problem:
+    """Everything a solve needs, read once from the database."""
+    week_start: date
+    employees: tuple
+    time_off: tuple  # TimeOff entries overlapping the week
+    history: dict = field(default_factory=dict)  # employee name -> ShiftRollup
+
+
+def compile_problem(start_date, database):
+    """Load the roster, the week's time off and shift history into a Problem.
+
+    The roster and time off come from the database's snapshot file when it
+    is current (see snapshot.py). The shift history is the FAIRNESS_WINDOW
+    rollup, which always ends at the latest published week whatever
+    start_date is; see fairness_weights.
+    """
+    # Imported here so the GUI can start without loading numpy
+    from snapshot import compiled_roster
+
+    week_start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    employees, time_off_requests = compiled_roster(database)
+    return week_problem(
+        week_start,
+        employees,
+        time_off_requests,
+        database.get_shift_rollups(FAIRNESS_WINDOW),
+    )
+
+
+def week_problem(week_start, employees, time_off_requests, history=None):
+    """Build a Problem for one week from an already loaded roster and time off."""
+    week_end = week_start + timedelta(days=len(DAYS) - 1)
+    time_off = tuple(
+        entry for entry in time_off_requests
+        if entry.start_date <= week_end and entry.end_date >= week_start
+    )
+    return Problem(week_start, employees, time_off, history or {})
+
+
+def fairness_weights(employee, rollup):
+    """Return (shift_cost, preferred, unwanted) objective multipliers from past weeks.
+
+    Employees who worked fewer shifts than their minimum over the window
+    pay less per extra shift (down to half), those who worked more pay up
+    to double. Few preferred hits raise the preference reward, and past
+    unwanted shifts make another one costlier.
+
+    The rollup covers the weeks up to the latest published one, not the
+    weeks before the one being solved. Re-solving or back-filling an
+    earlier week therefore weights it with history from later weeks.
+    """
+    if rollup is None or not rollup.weeks:
+        return 1.0, 1.0, 1.0
+
+    shift_cost = 1.0
+    expected = employee.min_shifts * rollup.weeks
+    if expected:
+        balance = max(-1.0, min(1.0, (rollup.shifts - expected) / expected))
+        shift_cost = 1 + balance if balance > 0 else 1 / (1 - balance)
+
+    preferred = 1.0
+    if employee.preferred and rollup.shifts:
+        preferred = 2 - rollup.preferred / rollup.shifts
+
+    unwanted = 1 + min(1.0, rollup.unwanted / rollup.weeks)
+
+    # Rounded so near-identical histories still fall into one class
+    return round(shift_cost, 2), round(preferred, 2), round(unwanted, 2)
+
+
+def excluded_cells(excluded):
+    """Convert excluded (day, slot) pairs to cell ids, ignoring unknown names."""
+    cells = set()
+    for day, slot in excluded or ():
+        cell = cell_of(day, slot)
+        if cell is not None:
+            cells.add(cell)
+    return frozenset(cells)
+
 
 def generate_schedule(start_date, database, excluded=None):
-    # Only change to enter debug mode
-    debug_mode = False
-
-    # -------------------- Setup --------------------
-    start_date = datetime.strptime(start_date, "%Y-%m-%d")
-
-    days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    time_slots = ["12am-6am", "6am-12pm", "9am-3pm", "12pm-6pm", "3pm-9pm", "6pm-12am", "9pm-3am"]
-
-    # Convert excluded (day, slot) pairs to index-based (d, s) pairs
-    excluded_set = set()
-    if excluded:
-        for day, slot in excluded:
-            if day in days_of_week and slot in time_slots:
-                d = days_of_week.index(day)
-                s = time_slots.index(slot)
-                excluded_set.add((d, s))
-
-    employees = database.get_all_employees()
-
-    # Add a placeholder employee to represent unfilled shifts
-    no_employee = {
-        "name": "No Employee",
-        "availability": {day: time_slots for day in days_of_week},
-        "min_shifts": 0,
-        "max_shifts": len(time_slots) * len(days_of_week),
-    }
-    employees.append(no_employee)
-
-    # -------------------- Time-Off Handling --------------------
-    time_off_requests = database.get_all_time_off_requests()
-    unavailable_dates = defaultdict(set)
-
-    week_start = start_date
-    week_end = week_start + timedelta(days=6)
-
-    # Loops through time_off_requests and marks those days unavailable
-    for entry in time_off_requests:
-        name = entry["employee_name"]
-        start = datetime.strptime(entry["start_date"], "%Y-%m-%d").date()
-        end = datetime.strptime(entry["end_date"], "%Y-%m-%d").date()
-        current = start
-        while current <= end:
-            if week_start.date() <= current <= week_end.date():
-                unavailable_dates[name].add(current)
-            current += timedelta(days=1)
+    """Solve one week with a time limit and worker count learned from past solves."""
+    problem = compile_problem(start_date, database)
+    excluded_set = excluded_cells(excluded)
+    time_limit, num_workers = suggest_budget(
+        database.get_solve_stats(), instance_features(problem, excluded_set)
+    )
+    schedule = solve(problem, excluded_set, num_workers=num_workers, time_limit=time_limit)
+    database.record_solve(schedule.stats)
+    return schedule
+
+
+def week_days_off(problem):
+    """Return {employee name: set of day indices} with time off this week."""
+    days_off = {}
+    for d in range(len(DAYS)):
+        for name in names_on_time_off(problem.time_off, problem.week_start + timedelta(days=d)):
+            days_off.setdefault(name, set()).add(d)
+    return days_off
+
+
+def instance_features(problem, excluded_set=frozenset(), days_off=None):
+    if days_off is None:
+        days_off = week_days_off(problem)
+    names = {employee.name for employee in problem.employees}
+    days = sum(len(off) for name, off in days_off.items() if name in names)
+    pairs = len(problem.employees) * len(DAYS)
+    return InstanceFeatures(
+        employees=len(problem.employees),
+        active_cells=NUM_CELLS - len(excluded_set),
+        excluded_cells=len(excluded_set),
+        time_off_density=days / pairs if pairs else 0.0,
+    )
 
 
+def employee_classes(employees, days_off, weights=None):
+    """Group interchangeable employees.
+
+    Employees with the same availability, preferences, shift limits,
+    time-off days and fairness weights are indistinguishable to the model.
+    Returns lists of roster indices, ordered by each class's first member.
+    """
+    classes = {}
+    for e, employee in enumerate(employees):
+        key = (
+            employee.available,
+            employee.preferred,
+            employee.min_shifts,
+            employee.max_shifts,
+            frozenset(days_off.get(employee.name, ())),
+            weights[e] if weights else None,
+        )
+        classes.setdefault(key, []).append(e)
+    return list(classes.values())
+
+
+def split_class_shifts(members, cells, rotation=0, preferred=frozenset()):
+    """Hand a class's shifts out to its members.
+
+    Each day's shifts go to the members with the fewest shifts so far. The
+    model allows at most len(members) shifts per day, so no member gets two
+    on one day, and counts differ by at most one, which keeps each member
+    inside the class's per-member min/max. Among those, the day's preferred
+    shifts go to whoever has had the fewest so far, so they are shared out
+    evenly too. rotation breaks the remaining ties.
+    """
+    k = len(members)
+    order = [members[(rotation + i) % k] for i in range(k)]
+    shifts = dict.fromkeys(order, 0)
+    hits = dict.fromkeys(order, 0)
+
+    by_day = {}
+    for c in cells:
+        by_day.setdefault(c // len(TIME_SLOTS), []).append(c)
+
+    assignments = []
+    for day_cells in by_day.values():
+        day_cells.sort(key=lambda c: c not in preferred)
+        # Sorts are stable, so ties keep the rotated order
+        chosen = sorted(order, key=lambda m: (shifts[m], hits[m]))[:len(day_cells)]
+        chosen.sort(key=lambda m: hits[m])
+        for c, m in zip(day_cells, chosen):
+            assignments.append((c, m))
+            shifts[m] += 1
+            hits[m] += c in preferred
+    return assignments
+
+
+def solve(problem, excluded_set=frozenset(), verbose=True, num_workers=0, time_limit=None,
+          aggregate=True):
+    """Build and solve the CP-SAT model for a Problem, returning a Schedule.
+
+    num_workers of 0 lets the solver pick its own thread count; time_limit
+    caps the search in seconds. With aggregate, interchangeable employees
+    share one set of variables (see employee_classes).
+    """
+    # Imported here so the GUI can start without loading OR-Tools
+    from ortools.sat.python import cp_model
+
+    week_start = problem.week_start
+    employees = problem.employees
+
+    # Day indices within this week on which each employee has time off
+    days_off = week_days_off(problem)
+
+    weights = [fairness_weights(e, problem.history.get(e.name)) for e in employees]
+
+    if aggregate:
+        classes = employee_classes(employees, days_off, weights)
+    else:
+        classes = [[e] for e in range(len(employees))]
+
     # -------------------- Constraint Model Setup --------------------
     model = cp_model.CpModel()
 
-    num_employees = len(employees)
-    num_shifts = len(time_slots)
-    num_days = len(days_of_week)
+    num_shifts = len(TIME_SLOTS)
+    num_days = len(DAYS)
 
-    all_employees = range(num_employees)
-    all_shifts = range(num_shifts)
+    all_classes = range(len(classes))
     all_days = range(num_days)
+    active_cells = [c for c in range(NUM_CELLS) if c not in excluded_set]
+    cells_by_day = [
+        [cell_id(d, s) for s in range(num_shifts) if cell_id(d, s) not in excluded_set]
+        for d in all_days
+    ]
+
+    # Every member of a class looks like its first member to the model
+    representatives = [employees[members[0]] for members in classes]
+    shift_cost = [weights[members[0]][0] for members in classes]
+    preferred_weight = [weights[members[0]][1] for members in classes]
+    unwanted_weight = [weights[members[0]][2] for members in classes]
+    sizes = [len(members) for members in classes]
 
     # -------------------- Shift Variables --------------------
+    # shifts[(g, c)] is 1 when some member of class g works cell c
     shifts = {}
-    for e in all_employees:
-        for d in all_days:
-            for s in all_shifts:
-                if (d, s) in excluded_set:
-                    continue
-                shifts[(e, d, s)] = model.NewBoolVar(f"shift_e{e}_d{d}_s{s}")
+    for g in all_classes:
+        for c in active_cells:
+            d, s = divmod(c, num_shifts)
+            if sizes[g] == 1:
+                shifts[(g, c)] = model.NewBoolVar(f"shift_e{classes[g][0]}_d{d}_s{s}")
+            else:
+                shifts[(g, c)] = model.NewBoolVar(f"shift_g{g}_d{d}_s{s}")
+
+    # Marks a cell left without an employee
+    unfilled = {}
+    for c in active_cells:
+        d, s = divmod(c, num_shifts)
+        unfilled[c] = model.NewBoolVar(f"unfilled_d{d}_s{s}")
 
     # -------------------- Basic Constraints --------------------
 
-    # Ensure each shift has exactly one assigned employee
-    for d in all_days:
-        for s in all_shifts:
-            if (d, s) in excluded_set:
-                continue
-            model.AddExactlyOne(shifts[(e, d, s)] for e in all_employees)
+    # Ensure each shift has exactly one assigned employee, or is left unfilled
+    for c in active_cells:
+        model.AddExactlyOne([shifts[(g, c)] for g in all_classes] + [unfilled[c]])
 
-
-    # Ensure employees have at most one shift per day (excluding 'No Employee')
-    for e in range(num_employees - 1):
+    # Ensure employees have at most one shift per day, i.e. a class covers
+    # at most as many shifts per day as it has members
+    for g in all_classes:
         for d in all_days:
-            model.AddAtMostOne(
-                shifts[(e, d, s)] for s in all_shifts if (d, s) not in excluded_set
-            )
-
+            if sizes[g] == 1:
+                model.AddAtMostOne(shifts[(g, c)] for c in cells_by_day[d])
+            elif len(cells_by_day[d]) > sizes[g]:
+                model.Add(sum(shifts[(g, c)] for c in cells_by_day[d]) <= sizes[g])
 
     # -------------------- Objective Weights --------------------
     preferred_shift_weight = 1
     not_available_penalty = -50
     no_employee_penalty = -40
 
-    # Penalize assigning employees to shifts they're not available 
+    # Penalize assigning employees to shifts they're not available
     available_shifts = sum(
-        not_available_penalty * shifts[(e, d, s)]
-        for e in range(num_employees - 1)
-        for d in all_days
-        for s in all_shifts
-        if (d, s) not in excluded_set and
-           (time_slots[s] not in employees[e]['availability'].get(days_of_week[d], []) and
-            f"{time_slots[s]} *" not in employees[e]['availability'].get(days_of_week[d], []))
+        not_available_penalty * unwanted_weight[g] * shifts[(g, c)]
+        for g in all_classes
+        for c in active_cells
+        if c not in representatives[g].available
     )
 
-
     # -------------------- Time-Off Constraint & Shift Adjustment --------------------
-    employee_diff = defaultdict(int)
-
+    employee_diff = {}
 
     # Restricts employee assigning on time off requests
-    for d in all_days:
-        date = week_start + timedelta(days=d)
-        day_name = days_of_week[d]
-        for e in range(num_employees - 1):
-            name = employees[e]["name"]
-            if date.date() in unavailable_dates[name]:
-                for s in all_shifts:
-                    if (d, s) not in excluded_set:
-                        model.Add(shifts[(e, d, s)] == 0)
-                if employees[e]["availability"].get(day_name):
-                    employee_diff[e] += 1
+    for g in all_classes:
+        employee = representatives[g]
+        off = days_off.get(employee.name)
+        if not off:
+            continue
+        available_days = {c // num_shifts for c in employee.available}
+        for d in off:
+            for c in cells_by_day[d]:
+                model.Add(shifts[(g, c)] == 0)
+            if d in available_days:
+                employee_diff[g] = employee_diff.get(g, 0) + 1
 
     # Reward assigning employees to their preferred shifts
     preferred_shifts = sum(
-        preferred_shift_weight * shifts[(e, d, s)]
-        for e in range(num_employees - 1)
-        for d in all_days
-        for s in all_shifts
-        if (d, s) not in excluded_set and
-           (f"{time_slots[s]} *" in employees[e]['availability'].get(days_of_week[d], []))
+        preferred_shift_weight * preferred_weight[g] * shifts[(g, c)]
+        for g in all_classes
+        for c in representatives[g].preferred
+        if c not in excluded_set
     )
 
-    # Penalize using the 'No Employee' placeholder
-    no_employee_score = sum(
-        no_employee_penalty * shifts[(num_employees - 1, d, s)]
-        for d in all_days
-        for s in all_shifts
-        if (d, s) not in excluded_set
-    )
+    # Penalize leaving shifts unfilled
+    no_employee_score = sum(no_employee_penalty * unfilled[c] for c in active_cells)
 
     # -------------------- Shift Count Constraints --------------------
 
     total_shift_penalty = 0
 
-    for e in range(num_employees - 1):
-        total_shifts_worked = sum(
-            shifts[(e, d, s)] for d in all_days for s in all_shifts if (d, s) not in excluded_set
-        )
+    for g in all_classes:
+        # Shifts worked by the whole class; limits scale with its size
+        total_shifts_worked = sum(shifts[(g, c)] for c in active_cells)
+        k = sizes[g]
 
-        min_shifts = employees[e]["min_shifts"]
-        max_shifts = employees[e]["max_shifts"]
+        min_shifts = representatives[g].min_shifts
+        max_shifts = representatives[g].max_shifts
 
-        adjustment = employee_diff.get(e, 0)
+        adjustment = employee_diff.get(g, 0)
         max_shifts = max(max_shifts - adjustment, 0)
         min_shifts = min(min(min_shifts, 2), max_shifts)
 
         if min_shifts > 0:
-            shift_penalty = (total_shifts_worked - min_shifts) * (10 / min_shifts)
+            shift_penalty = (total_shifts_worked - k * min_shifts) * (10 / min_shifts) * shift_cost[g]
             total_shift_penalty += shift_penalty
 
-        model.Add(total_shifts_worked >= min_shifts)
-        model.Add(total_shifts_worked <= max_shifts)
+        model.Add(total_shifts_worked >= k * min_shifts)
+        model.Add(total_shifts_worked <= k * max_shifts)
 
     model.Maximize(
         no_employee_score + preferred_shifts + available_shifts - total_shift_penalty
@@ -170,93 +340,75 @@ def generate_schedule(start_date, database, excluded=None):
 
     # -------------------- Solve Model --------------------
     solver = cp_model.CpSolver()
-    status = solver.Solve(model)
+    if num_workers:
+        solver.parameters.num_workers = num_workers
+    if time_limit:
+        solver.parameters.max_time_in_seconds = time_limit
+
+    class FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+        def __init__(self):
+            super().__init__()
+            self.time_to_first = None
+
+        def on_solution_callback(self):
+            if self.time_to_first is None:
+                self.time_to_first = self.WallTime()
+
+    timer = FirstSolutionTimer()
+    status = solver.Solve(model, timer)
+    solved = status in {cp_model.OPTIMAL, cp_model.FEASIBLE}
+
+    stats = SolveStats(
+        features=instance_features(problem, excluded_set, days_off),
+        time_limit=time_limit,
+        num_workers=num_workers,
+        status=solver.StatusName(status),
+        wall_time=solver.WallTime(),
+        time_to_first=timer.time_to_first,
+        time_to_optimal=solver.WallTime() if status == cp_model.OPTIMAL else None,
+    )
+    schedule = Schedule(week_start, [None] * NUM_CELLS, frozenset(excluded_set), solved, stats=stats)
 
+    if not solved:
+        if verbose:
+            print("No feasible solution found!")
+        return schedule
 
-    # -------------------- Report Results --------------------
-    for e in range(num_employees - 1):
-        total_shifts_worked = sum(
-            solver.Value(shifts[(e, d, s)])
-            for d in all_days
-            for s in all_shifts
-            if (d, s) not in excluded_set
-        )
+    # -------------------- Generate Final Schedule --------------------
+    # Rotate who gets a class's extra shifts from week to week
+    rotation = week_start.toordinal() // num_days
+    shifts_worked = [0] * len(employees)
+    for g in all_classes:
+        cells = [c for c in active_cells if solver.Value(shifts[(g, c)]) == 1]
+        for c, e in split_class_shifts(classes[g], cells, rotation, representatives[g].preferred):
+            schedule.assignments[c] = employees[e].name
+            shifts_worked[e] += 1
+
+    schedule.objective = solver.ObjectiveValue()
+
+    if not verbose:
+        return schedule
 
-        employee = employees[e]['name']
+    # -------------------- Report Results --------------------
+    class_of = {e: g for g in all_classes for e in classes[g]}
+    for e, employee in enumerate(employees):
+        g = class_of[e]
 
-        if e not in employee_diff:
-            min_shifts = employees[e]["min_shifts"]
+        if g not in employee_diff:
+            min_shifts = employee.min_shifts
         else:
-            min_shifts = min(0, employees[e]["min_shifts"] - employee_diff[e])
+            min_shifts = min(0, employee.min_shifts - employee_diff[g])
 
-        shift_diff = total_shifts_worked - min_shifts
+        shift_diff = shifts_worked[e] - min_shifts
 
-        print(f"Employee: {employee}, Minimum Shifts: {min_shifts}, Shifts Worked: {total_shifts_worked}, Difference: {shift_diff}")
+        print(f"Employee: {employee.name}, Minimum Shifts: {min_shifts}, Shifts Worked: {shifts_worked[e]}, Difference: {shift_diff}")
 
-    # -------------------- Generate Final Schedule --------------------
-    schedule = {day: {slot: "No Employees" for slot in time_slots} for day in days_of_week}
-
-    if status in {cp_model.OPTIMAL, cp_model.FEASIBLE}:
-        for d in all_days:
-            for s in all_shifts:
-                if (d, s) in excluded_set:
-                    continue
-                for e in all_employees:
-                    if solver.Value(shifts[(e, d, s)]) == 1:
-                        day = days_of_week[d]
-                        slot = time_slots[s]
-                        if schedule[day][slot] == "No Employees":
-                            schedule[day][slot] = employees[e]['name']
-                        else:
-                            schedule[day][slot] += f", {employees[e]['name']}"
-
-        # Mark explicitly excluded cells
-        for day, slot in excluded:
-            schedule[day][slot] = "Excluded"
-
-        print("Solution found!")
-        print("\nStatistics")
-        print(f"  - conflicts: {solver.NumConflicts()}")
-        print(f"  - branches : {solver.NumBranches()}")
-        print(f"  - wall time: {solver.WallTime()} s")
-        print(f"Schedule Score = {solver.ObjectiveValue()}")
-
-        if debug_mode:
-            while True:
-                print("\n--- DEBUG MODE: Check Availability ---")
-                day_input = input("Enter a day to inspect (e.g., Monday), or 'exit' to quit: ").strip()
-                if day_input.lower() == "exit":
-                    break
-                if day_input not in days_of_week:
-                    print("Invalid day. Try again.")
-                    continue
-
-                print(f"Available time slots: {', '.join(time_slots)}")
-                slot_input = input("Enter a time slot (e.g., 12pm-6pm): ").strip()
-                if slot_input not in time_slots:
-                    print("Invalid time slot. Try again.")
-                    continue
-
-                d = days_of_week.index(day_input)
-                s = time_slots.index(slot_input)
-
-                available = []
-                for e in range(num_employees - 1):
-                    availability = employees[e]['availability'].get(day_input, [])
-                    if time_slots[s] in availability or f"{time_slots[s]} *" in availability:
-                        available.append(employees[e]['name'])
-
-                if available:
-                    print(f"{day_input} - {slot_input}: Available Employees -> {', '.join(available)}")
-                else:
-                    print(f"No one is available for {day_input} - {slot_input}")
-
-        return schedule
-
-    else:
-        print("No feasible solution found!")
-        # Still mark excluded cells for UI consistency
-        for day, slot in excluded:
-            schedule[day][slot] = "Excluded"
-        return schedule
+    print("Solution found!")
+    print("\nStatistics")
+    print(f"  - classes  : {len(classes)} for {len(employees)} employees")
+    print(f"  - conflicts: {solver.NumConflicts()}")
+    print(f"  - branches : {solver.NumBranches()}")
+    print(f"  - wall time: {solver.WallTime()} s")
+    print(f"Schedule Score = {schedule.objective}")
 
+    return schedule
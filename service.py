@@ -0,0 +1,344 @@
+"""Local HTTP/JSON scheduling service.
+
+Only the event loop thread touches the SQLite database, so writes from
+several users are serialized without locking. Solves run in a bounded
+process pool fed from a queue, and results are fetched by job id. Only
+the newest finished jobs are kept (--max-finished).
+
+    python service.py --port 8765 --workers 2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from urllib.parse import unquote, urlsplit
+from database import Database
+from models import DAYS, TIME_SLOTS
+from scheduler_logic import compile_problem, excluded_cells, instance_features, solve
+from solve_budget import suggest_budget
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+REASONS = {200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 503: "Service Unavailable"}
+
+
+def employee_to_json(employee):
+    return {
+        "id": employee.id,
+        "name": employee.name,
+        "phone": employee.phone,
+        "max_shifts": employee.max_shifts,
+        "min_shifts": employee.min_shifts,
+        "availability": employee.availability,
+    }
+
+
+def time_off_to_json(entry):
+    return {
+        "employee_name": entry.employee_name,
+        "start_date": entry.start_date.isoformat(),
+        "end_date": entry.end_date.isoformat(),
+        "reason": entry.reason,
+    }
+
+
+def schedule_to_json(schedule):
+    return {
+        "start_date": schedule.start_date.isoformat(),
+        "solved": schedule.solved,
+        "objective": schedule.objective,
+        "schedule": schedule.as_table(),
+    }
+
+
+def _run_job(problem, excluded, time_limit, num_workers):
+    return solve(problem, excluded, verbose=False, num_workers=num_workers, time_limit=time_limit)
+
+
+class SchedulerService:
+    def __init__(self, database, workers=2, max_queued=100, max_time_limit=300.0, max_finished=1000):
+        self.database = database
+        self.workers = workers
+        self.max_time_limit = max_time_limit
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.schedules = {}  # job id -> Schedule, kept for publishing
+        self.finished = deque()  # ids of done or failed jobs, oldest first
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        # Spawned, not forked, so workers don't inherit the listening socket
+        # or whichever client connection is open when they start
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        # Split the CPUs between pool processes
+        self.solver_workers = max(1, (os.cpu_count() or 1) // workers)
+        self._job_ids = itertools.count(1)
+        self._consumers = []
+
+    def start(self):
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self.pool.shutdown(cancel_futures=True)
+
+    # -------------------- Jobs --------------------
+
+    def submit(self, body):
+        start_date = body.get("start_date")
+        if not start_date:
+            raise HTTPError(400, "start_date is required")
+        try:
+            date.fromisoformat(start_date)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "start_date must be YYYY-MM-DD")
+
+        # Without an explicit limit, one is picked from past solves when the job runs
+        time_limit = body.get("time_limit")
+        if time_limit is not None:
+            time_limit = min(max(float(time_limit), 0.1), self.max_time_limit)
+        job = {
+            "id": str(next(self._job_ids)),
+            "status": "queued",
+            "start_date": start_date,
+            "excluded": [tuple(pair) for pair in body.get("excluded", [])],
+            "time_limit": time_limit,
+            "result": None,
+            "error": None,
+        }
+        try:
+            self.queue.put_nowait(job["id"])
+        except asyncio.QueueFull:
+            raise HTTPError(503, "job queue is full")
+        self.jobs[job["id"]] = job
+        return job
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self.jobs[await self.queue.get()]
+            job["status"] = "running"
+            try:
+                # Read the database here, on the loop thread; workers only see the Problem
+                problem = compile_problem(job["start_date"], self.database)
+                excluded = excluded_cells(job["excluded"])
+                time_limit, num_workers = suggest_budget(
+                    self.database.get_solve_stats(),
+                    instance_features(problem, excluded),
+                    cpus=self.solver_workers,
+                )
+                if job["time_limit"] is None:
+                    job["time_limit"] = min(time_limit, self.max_time_limit)
+                schedule = await loop.run_in_executor(
+                    self.pool, _run_job, problem, excluded, job["time_limit"], num_workers,
+                )
+                self.database.record_solve(schedule.stats)
+                self.schedules[job["id"]] = schedule
+                job["result"] = schedule_to_json(schedule)
+                job["status"] = "done"
+            except Exception as exc:
+                job["error"] = str(exc)
+                job["status"] = "failed"
+            finally:
+                self._forget_old_jobs(job["id"])
+                self.queue.task_done()
+
+    def _forget_old_jobs(self, job_id):
+        """Keep only the newest max_finished finished jobs and their schedules."""
+        self.finished.append(job_id)
+        while len(self.finished) > self.max_finished:
+            old = self.finished.popleft()
+            self.jobs.pop(old, None)
+            self.schedules.pop(old, None)
+
+    # -------------------- Routing --------------------
+
+    def handle(self, method, path, body):
+        parts = [unquote(part) for part in urlsplit(path).path.strip("/").split("/") if part]
+        if not parts:
+            raise HTTPError(404, "not found")
+        resource, args = parts[0], parts[1:]
+
+        if resource == "employees":
+            return self._employees(method, args, body)
+        if resource == "time-off":
+            return self._time_off(method, args, body)
+        if resource == "jobs":
+            if method == "POST" and not args:
+                job = self.submit(body)
+                return 202, {"id": job["id"], "status": job["status"]}
+            if method == "GET" and not args:
+                return 200, [{"id": job["id"], "status": job["status"]} for job in self.jobs.values()]
+            if method == "GET" and len(args) == 1:
+                job = self.jobs.get(args[0])
+                if job is None:
+                    raise HTTPError(404, "no such job")
+                return 200, job
+            if method == "POST" and len(args) == 2 and args[1] == "publish":
+                schedule = self.schedules.get(args[0])
+                if schedule is None or not schedule.solved:
+                    raise HTTPError(404, "no solved schedule for this job")
+                self.database.publish_schedule(schedule)
+                return 200, {"published": args[0]}
+            raise HTTPError(405, "method not allowed")
+        raise HTTPError(404, "not found")
+
+    def _employees(self, method, args, body):
+        if method == "GET" and not args:
+            return 200, [employee_to_json(e) for e in self.database.get_all_employees()]
+        if method == "POST" and not args:
+            fields = self._employee_fields(body, body.get("name"))
+            if self.database.get_employee_by_name(fields[0]) is not None:
+                raise HTTPError(409, "an employee with this name already exists")
+            self.database.add_employee(*fields)
+            return 201, employee_to_json(self.database.get_employee_by_name(body["name"]))
+        if len(args) != 1:
+            raise HTTPError(404, "not found")
+
+        employee = self.database.get_employee_by_name(args[0])
+        if employee is None:
+            raise HTTPError(404, "no such employee")
+        if method == "GET":
+            return 200, employee_to_json(employee)
+        if method == "PUT":
+            merged = {**employee_to_json(employee), **body}
+            self.database.update_employee(*self._employee_fields(merged, employee.name))
+            return 200, employee_to_json(self.database.get_employee_by_name(employee.name))
+        if method == "DELETE":
+            self.database.delete_employee(employee.name)
+            return 200, {"deleted": employee.name}
+        raise HTTPError(405, "method not allowed")
+
+    @staticmethod
+    def _employee_fields(body, name):
+        """Validate an employee body before anything is written."""
+        if not name or not isinstance(name, str):
+            raise HTTPError(400, "name is required")
+        availability = body.get("availability", {})
+        if not isinstance(availability, dict):
+            raise HTTPError(400, "availability must map days to lists of slots")
+        for day, slots in availability.items():
+            if day not in DAYS:
+                raise HTTPError(400, f"unknown day: {day}")
+            if not isinstance(slots, list):
+                raise HTTPError(400, "availability must map days to lists of slots")
+            for slot in slots:
+                # A trailing " *" marks a preferred slot
+                if not isinstance(slot, str) or slot.removesuffix(" *") not in TIME_SLOTS:
+                    raise HTTPError(400, f"unknown slot: {slot}")
+        try:
+            max_shifts = int(body.get("max_shifts", 0))
+            min_shifts = int(body.get("min_shifts", 0))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "max_shifts and min_shifts must be integers")
+        return name, body.get("phone", ""), availability, max_shifts, min_shifts
+
+    def _time_off(self, method, args, body):
+        if method == "GET" and not args:
+            return 200, [time_off_to_json(r) for r in self.database.get_all_time_off_requests()]
+        if method == "POST" and not args:
+            try:
+                name = body["employee_name"]
+                start = date.fromisoformat(body["start_date"]).isoformat()
+                end = date.fromisoformat(body.get("end_date", start)).isoformat()
+            except (KeyError, TypeError, ValueError):
+                raise HTTPError(400, "employee_name and start_date (YYYY-MM-DD) are required")
+            self.database.add_time_off_request(name, start, end, body.get("reason", ""))
+            return 201, {"employee_name": name, "start_date": start, "end_date": end}
+        if method == "DELETE" and len(args) == 2:
+            self.database.delete_time_off_request(args[0], args[1])
+            return 200, {"deleted": args}
+        raise HTTPError(405, "method not allowed")
+
+    # -------------------- HTTP --------------------
+
+    async def serve_client(self, reader, writer):
+        try:
+            status, payload = await self._read_and_handle(reader)
+        except HTTPError as exc:
+            status, payload = exc.status, {"error": exc.message}
+        except Exception as exc:
+            status, payload = 400, {"error": str(exc)}
+
+        data = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_and_handle(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            raise HTTPError(400, "malformed request")
+        method, path = request_line[0].upper(), request_line[1]
+
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "content-length":
+                length = int(value.strip())
+
+        body = {}
+        if length:
+            body = json.loads(await reader.readexactly(length))
+            if not isinstance(body, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+        return self.handle(method, path, body)
+
+
+async def serve(host, port, db_path, workers, max_queued, max_time_limit, max_finished):
+    service = SchedulerService(Database(db_path), workers, max_queued, max_time_limit, max_finished)
+    service.start()
+    server = await asyncio.start_server(service.serve_client, host, port)
+    print(f"Scheduling service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local scheduling service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="employee_scheduler.db")
+    parser.add_argument("--workers", type=int, default=2, help="concurrent solves")
+    parser.add_argument("--max-queued", type=int, default=100)
+    parser.add_argument("--max-time-limit", type=float, default=300.0, help="cap on seconds per solve")
+    parser.add_argument("--max-finished", type=int, default=1000, help="finished jobs kept for fetching")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(
+            args.host, args.port, args.db, args.workers, args.max_queued, args.max_time_limit,
+            args.max_finished,
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Binary snapshot of the compiled roster and time off, stored next to the database.
+
+The file holds fixed-layout arrays behind a small header, so it can be
+opened with numpy.memmap and read without touching SQLite or parsing
+availability strings. It is rewritten whenever the database's change
+counter moves past the one recorded in the header, or the header names a
+different database (one recreated or restored from backup at that path).
+"""
+import os
+import struct
+from datetime import date
+import numpy as np
+from models import NUM_CELLS, Employee, TimeOff
+
+MAGIC = b"SCHEDSNP"
+FORMAT_VERSION = 2
+
+# magic, format version, reserved, database id, change counter, employees,
+# time-off entries, string bytes
+HEADER = struct.Struct("<8sIIqqqqq")
+HEADER_SIZE = 64
+
+
+def snapshot_path(db_path):
+    return f"{db_path}.snapshot"
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(n, m, blob_len):
+    """Return {name: (offset, dtype, shape)} for a file with n employees and m time-off entries."""
+    fields = [
+        ("ids", np.int64, (n,)),
+        ("limits", np.int32, (n, 2)),  # min_shifts, max_shifts
+        ("available", np.uint8, (n, NUM_CELLS)),
+        ("preferred", np.uint8, (n, NUM_CELLS)),
+        ("time_off_dates", np.int32, (m, 2)),  # start and end ordinals
+        # Strings: n names, n phones, then m time-off employee names
+        ("string_offsets", np.int64, (2 * n + m + 1,)),
+        ("strings", np.uint8, (blob_len,)),
+    ]
+    layout = {}
+    offset = HEADER_SIZE
+    for name, dtype, shape in fields:
+        layout[name] = (offset, dtype, shape)
+        offset = _align(offset + np.dtype(dtype).itemsize * int(np.prod(shape)))
+    return layout, offset
+
+
+def write_snapshot(database, path=None):
+    """Write the database's roster and time off to a snapshot file."""
+    path = path or snapshot_path(database.path)
+    database_id = database.database_id()
+    change_counter = database.change_counter()
+    employees = database.get_all_employees()
+    time_off = database.get_all_time_off_requests()
+    n, m = len(employees), len(time_off)
+
+    encoded = [e.name.encode() for e in employees]
+    encoded += [(e.phone or "").encode() for e in employees]
+    encoded += [entry.employee_name.encode() for entry in time_off]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in encoded], out=string_offsets[1:])
+    blob = b"".join(encoded)
+
+    arrays = {
+        "ids": np.array([e.id for e in employees], dtype=np.int64),
+        "limits": np.array([(e.min_shifts, e.max_shifts) for e in employees], dtype=np.int32).reshape(n, 2),
+        "available": np.zeros((n, NUM_CELLS), dtype=np.uint8),
+        "preferred": np.zeros((n, NUM_CELLS), dtype=np.uint8),
+        "time_off_dates": np.array(
+            [(e.start_date.toordinal(), e.end_date.toordinal()) for e in time_off], dtype=np.int32
+        ).reshape(m, 2),
+        "string_offsets": string_offsets,
+        "strings": np.frombuffer(blob, dtype=np.uint8),
+    }
+    for i, employee in enumerate(employees):
+        arrays["available"][i, list(employee.available)] = 1
+        arrays["preferred"][i, list(employee.preferred)] = 1
+
+    layout, size = _layout(n, m, len(blob))
+    buffer = bytearray(size)
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, 0, database_id, change_counter, n, m, len(blob))
+    for name, (offset, dtype, shape) in layout.items():
+        data = arrays[name].astype(dtype, copy=False).tobytes()
+        buffer[offset:offset + len(data)] = data
+
+    # Write then rename, so readers only ever see a complete file
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as fp:
+        fp.write(buffer)
+    os.replace(tmp_path, path)
+    return path
+
+
+class Snapshot:
+    """Read-only view of a snapshot file; the arrays are memory-mapped, not copied."""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        if len(self._map) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a schedule snapshot")
+        magic, version, _, database_id, change_counter, n, m, blob_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} schedule snapshot")
+        self.database_id = database_id
+        self.change_counter = change_counter
+        self.num_employees = n
+
+        layout, size = _layout(n, m, blob_len)
+        if len(self._map) < size:
+            raise ValueError(f"{path} is truncated")
+        for name, (offset, dtype, shape) in layout.items():
+            count = int(np.prod(shape))
+            view = np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            setattr(self, name, view.reshape(shape))
+
+    def _strings(self):
+        blob = self.strings.tobytes()
+        offsets = self.string_offsets.tolist()
+        return [blob[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+    @staticmethod
+    def _cell_sets(matrix):
+        """Return one frozenset of set cell ids per row of a 0/1 matrix."""
+        rows, cells = np.nonzero(matrix)
+        bounds = np.searchsorted(rows, np.arange(len(matrix) + 1)).tolist()
+        cells = cells.tolist()
+        return [frozenset(cells[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+    def employees(self):
+        n = self.num_employees
+        strings = self._strings()
+        return tuple(
+            Employee(employee_id, strings[i], strings[n + i], max_shifts, min_shifts, available, preferred)
+            for i, (employee_id, (min_shifts, max_shifts), available, preferred) in enumerate(zip(
+                self.ids.tolist(),
+                self.limits.tolist(),
+                self._cell_sets(self.available),
+                self._cell_sets(self.preferred),
+            ))
+        )
+
+    def time_off(self):
+        names = self._strings()[2 * self.num_employees:]
+        return tuple(
+            TimeOff(None, name, date.fromordinal(start), date.fromordinal(end), "")
+            for name, (start, end) in zip(names, self.time_off_dates.tolist())
+        )
+
+
+def load_snapshot(path, change_counter=None, database_id=None):
+    """Open a snapshot, or return None if it is missing, unreadable or stale.
+
+    A snapshot is stale when its change counter or database id differs
+    from the ones given.
+    """
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    if change_counter is not None and snapshot.change_counter != change_counter:
+        return None
+    if database_id is not None and snapshot.database_id != database_id:
+        return None
+    return snapshot
+
+
+def current_snapshot(database):
+    """Return an up-to-date Snapshot for database, rebuilding a missing or stale one.
+
+    Returns None for in-memory databases or when the file cannot be written.
+    """
+    if database.path == ":memory:":
+        return None
+    path = snapshot_path(database.path)
+    snapshot = load_snapshot(path, database.change_counter(), database.database_id())
+    if snapshot is None:
+        try:
+            write_snapshot(database, path)
+        except OSError:
+            return None
+        snapshot = load_snapshot(path)
+    return snapshot
+
+
+def compiled_roster(database):
+    """Return (employees, time_off) for a database, from its snapshot when possible."""
+    snapshot = current_snapshot(database)
+    if snapshot is None:
+        return tuple(database.get_all_employees()), tuple(database.get_all_time_off_requests())
+    return snapshot.employees(), snapshot.time_off()
+
+
+def load_roster(source):
+    """Return employees from a snapshot path, or source itself if it already holds them.
+
+    Lets pool workers be handed a path to map instead of a pickled roster.
+    """
+    if isinstance(source, str):
+        return Snapshot(source).employees()
+    return source
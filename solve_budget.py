@@ -0,0 +1,92 @@
+import math
+import os
+
+DEFAULT_TIME_LIMIT = 30.0
+MIN_TIME_LIMIT = 1.0
+MAX_TIME_LIMIT = 300.0
+
+# Solves whose proof of optimality needs less than this gain little from parallel workers
+SMALL_SOLVE_SECONDS = 0.5
+
+NEIGHBORS = 10
+# Past solves further than this from an instance are not comparable; 1.0 is
+# roughly a factor of e in roster size with nothing else different
+MAX_DISTANCE = 1.0
+# Headroom over the slowest comparable solve
+SAFETY_FACTOR = 1.5
+# Limit multiplier over the longest recent comparable solve that found nothing in time
+GROWTH_FACTOR = 2.0
+
+
+def _distance(a, b):
+    """Distance between two InstanceFeatures; roster size compares on a log scale."""
+    return math.sqrt(
+        (math.log1p(a.employees) - math.log1p(b.employees)) ** 2
+        + ((a.active_cells - b.active_cells) / 49) ** 2
+        + ((a.excluded_cells - b.excluded_cells) / 49) ** 2
+        + (a.time_off_density - b.time_off_density) ** 2
+    )
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _proof_time(stats):
+    """Seconds a solve took to prove its result, or None if it ran out of time."""
+    if stats.time_to_optimal is not None:
+        return stats.time_to_optimal
+    if stats.status == "INFEASIBLE":
+        return stats.wall_time
+    return None
+
+
+def suggest_budget(history, features, cpus=None):
+    """Pick (time_limit, num_workers) for a solve from past SolveStats.
+
+    history is newest first. Looks at the most similar past solves within
+    MAX_DISTANCE. The limit covers the 90th percentile time those solves
+    took to prove their result, and to find a first solution, with some
+    headroom; solves that found a solution without a proof count only
+    through their time to first solution. Solves that found nothing before
+    their limit push it to GROWTH_FACTOR times the longest such limit, so
+    repeated failures grow it geometrically, until a newer comparable solve
+    finds a solution. With no comparable history the defaults apply.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    distances = [(_distance(stats.features, features), i) for i, stats in enumerate(history)]
+    nearest = sorted(i for distance, i in sorted(distances)[:NEIGHBORS] if distance <= MAX_DISTANCE)
+    nearest = [history[i] for i in nearest]  # newest first again
+    if not nearest:
+        return DEFAULT_TIME_LIMIT, min(cpus, 8)
+
+    proven = [t for t in map(_proof_time, nearest) if t is not None]
+    first = [stats.time_to_first for stats in nearest if stats.time_to_first is not None]
+    # Failures since the latest solve that found a solution or proved infeasibility
+    failed = []
+    for stats in nearest:
+        if stats.time_to_first is not None or _proof_time(stats) is not None:
+            break
+        if stats.time_limit:
+            failed.append(stats.time_limit)
+
+    if proven:
+        time_limit = SAFETY_FACTOR * _percentile(proven, 0.9)
+    elif first:
+        time_limit = 0.0
+    else:
+        time_limit = DEFAULT_TIME_LIMIT
+    # Always leave room to find a first solution
+    if first:
+        time_limit = max(time_limit, SAFETY_FACTOR * _percentile(first, 0.9))
+    if failed:
+        time_limit = max(time_limit, GROWTH_FACTOR * max(failed))
+    time_limit = min(max(time_limit, MIN_TIME_LIMIT), MAX_TIME_LIMIT)
+
+    unproven = len(proven) < len(nearest)
+    if proven and not unproven and _percentile(proven, 0.9) < SMALL_SOLVE_SECONDS:
+        num_workers = 1
+    else:
+        num_workers = min(cpus, 8)
+    return time_limit, num_workers